@@ -1,22 +1,31 @@
 # Yikai Wang
-from queue import PriorityQueue
-from copy import deepcopy
+from array import array
+from heapq import heappop, heappush
+import argparse
+import json
+import math
+import mmap
+import multiprocessing
+import os
 import sys
+import threading
+import time
+
+from cache import SolutionCache
 
 # Given filename, opens the file and returns the initial and goal state
 def parse(input):
-    init_state = []
-    goal_state = []
-
-    i = 0
+    rows = []
     for line in open(input, "r").readlines():
-        # initial state is in lines 0 - 2
-        if i < 3:
-            init_state.append([ int(i) for i in line.split() ])
-        # goal state is in lines 4 - 6
-        elif i > 3 and i < 7:
-            goal_state.append([ int(i) for i in line.split() ])
-        i += 1
+        # Skip the blank line between the two states
+        if line.split():
+            rows.append([ int(i) for i in line.split() ])
+
+    # The board is square, so the length of the first row gives the number of rows in each state
+    # ex: for a 3x3 board, initial state is in rows 0 - 2 and goal state is in rows 3 - 5
+    size = len(rows[0])
+    init_state = rows[:size]
+    goal_state = rows[size:2 * size]
 
     return init_state, goal_state
 
@@ -40,6 +49,263 @@ def dict_to_list(state):
         l[r][c] = num
     return l
 
+# Number of bits used to store each tile of a packed state
+# 4 bits per tile fits a 4x4 board (tiles 0 - 15) in a single 64 bit integer
+def tile_bits(size):
+    return max(4, (size * size - 1).bit_length())
+
+# Gets the state in list form and packs it into an integer, along with the index of the blank space
+# Cell i of the board (counting left to right, top to bottom) is stored in bits [i * bits, (i + 1) * bits)
+# ex: with 4 bits per tile, [[1, 2], [3, 0]] is packed into 0x0321
+def pack_state(l):
+    bits = tile_bits(len(l))
+    state = 0
+    blank = 0
+    i = 0
+    for row in l:
+        for num in row:
+            state |= num << (i * bits)
+            if num == 0:
+                blank = i
+            i += 1
+    return state, blank
+
+# Gets the state in packed form and converts it back to a list
+def unpack_state(state, size):
+    bits = tile_bits(size)
+    mask = (1 << bits) - 1
+    return [[(state >> ((r * size + c) * bits)) & mask for c in range(size)] for r in range(size)]
+
+# Gets the state in packed form and returns the [row, column] of every number
+# ex: positions[ 2 ] = (0, 1) means 2 is in row 0 column 1, just like the dictionary form
+def state_positions(state, size):
+    bits = tile_bits(size)
+    mask = (1 << bits) - 1
+    positions = [None] * (size * size)
+    for i in range(size * size):
+        positions[(state >> (i * bits)) & mask] = (i // size, i % size)
+    return positions
+
+# Slides the number at index target into the blank space at index blank
+# Returns the new packed state and the number that was moved
+# The blank space is stored as 0, so the number can just be xor'ed out of one cell and into the other
+def move_tile(state, blank, target, bits):
+    num = (state >> (target * bits)) & ((1 << bits) - 1)
+    return state ^ (num << (target * bits)) ^ (num << (blank * bits)), num
+
+# For each index of the board, lists the indexes in the same row and column (excluding itself)
+def board_lines(size):
+    lines = []
+    for i in range(size * size):
+        row, col = i // size, i % size
+        lines.append([row * size + c for c in range(size) if c != col] + [r * size + col for r in range(size) if r != row])
+    return lines
+
+# Move of the blank space that undoes each move
+OPPOSITE = {"U": "D", "D": "U", "L": "R", "R": "L"}
+
+# For each index of the blank space, lists the moves (U, D, L, R) it can make and the index it moves to
+def blank_moves(size):
+    moves = []
+    for i in range(size * size):
+        row, col = i // size, i % size
+        available = []
+        if row > 0:
+            available.append(("U", i - size))
+        if row < size - 1:
+            available.append(("D", i + size))
+        if col > 0:
+            available.append(("L", i - 1))
+        if col < size - 1:
+            available.append(("R", i + 1))
+        moves.append(available)
+    return moves
+
+# Pattern databases and distance tables are saved in this folder, so they are only built once
+TABLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tables")
+# Tables already opened by this process, by filename
+loaded_tables = dict()
+tables_lock = threading.Lock()
+
+# Splits the indexes of the goal state (except for the blank space) into the groups of the additive pattern database
+# Tiles are relabeled by their index in the goal state, so the same databases work for any goal with the blank space at blank
+def pattern_groups(size, blank):
+    cells = [i for i in range(size * size) if i != blank]
+    # 4x4 boards use a 5-5-5 split, smaller boards use groups of 4
+    k = 5 if size == 4 else 4
+    return [cells[i:i + k] for i in range(0, len(cells), k)]
+
+# Builds the pattern database for a group of tiles with a breadth first search backwards from the goal
+# Only moves of tiles in the group are counted, so the databases of disjoint groups can be added together
+# table[ sum of index of group[i] * (size * size) ** i ] is the fewest moves to get the group's tiles home
+def build_pattern_database(size, group, blank):
+    n = size * size
+    board = (1 << n) - 1
+    # Cells that are not on the left / right edge of the board, to flood fill the blank space with bit shifts
+    not_left = sum(1 << i for i in range(n) if i % size != 0)
+    not_right = sum(1 << i for i in range(n) if i % size != size - 1)
+    neighbors = [[target for move, target in moves] for moves in blank_moves(size)]
+    weights = [n ** i for i in range(len(group))]
+
+    # Other tiles can be moved for free, so the blank space can be anywhere in the region of
+    # cells connected to it that are not in the group. Returns the region as a bitmask
+    def flood(region, free):
+        while True:
+            grown = (region | ((region << 1) & not_left) | ((region >> 1) & not_right) | (region << size) | (region >> size)) & free
+            if grown == region:
+                return region
+            region = grown
+
+    table = bytearray([255]) * (n ** len(group))
+    occupied = sum(1 << i for i in group)
+    region = flood(1 << blank, board & ~occupied)
+    index = sum(group[i] * weights[i] for i in range(len(group)))
+    table[index] = 0
+    # States are the positions of the group's tiles and the region the blank space is in
+    seen = {(index << n) | region}
+    frontier = [(tuple(group), index, occupied, region)]
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for positions, index, occupied, region in frontier:
+            for i in range(len(positions)):
+                p = positions[i]
+                # A tile of the group can move into a neighboring cell if the blank space can get there
+                for q in neighbors[p]:
+                    if (region >> q) & 1:
+                        new_occupied = occupied ^ (1 << p) ^ (1 << q)
+                        new_region = flood(1 << p, board & ~new_occupied)
+                        new_index = index + (q - p) * weights[i]
+                        key = (new_index << n) | new_region
+                        if key not in seen:
+                            seen.add(key)
+                            # Breadth first, so the first time the tiles are seen in these positions is the fewest moves
+                            if table[new_index] == 255:
+                                table[new_index] = depth
+                            next_frontier.append((positions[:i] + (q,) + positions[i + 1:], new_index, new_occupied, new_region))
+        frontier = next_frontier
+    return table
+
+# Opens the table saved as name, building it with build() and saving it first if it was never built
+# The file is memory mapped so it loads instantly and processes using it share the same memory
+def load_table(name, length, build):
+    # Threads of the same process (see service.py) would write the same temporary file
+    with tables_lock:
+        return open_table(name, length, build)
+
+# load_table without the lock
+def open_table(name, length, build):
+    if name not in loaded_tables:
+        path = os.path.join(TABLE_DIR, name)
+        # Rebuild if the table is missing or was cut short
+        if not os.path.exists(path) or os.path.getsize(path) != length:
+            print("Building " + name + " (only needed once)...", file=sys.stderr)
+            table = build()
+            os.makedirs(TABLE_DIR, exist_ok=True)
+            # Write to a temporary file first so other processes never open a half written table
+            temp = path + "." + str(os.getpid()) + ".tmp"
+            with open(temp, "wb") as f:
+                f.write(table)
+            os.replace(temp, path)
+        with open(path, "rb") as f:
+            loaded_tables[name] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return loaded_tables[name]
+
+# Opens the pattern database of the group
+def load_pattern_database(size, group, blank):
+    name = "pdb_%dx%d_blank%d_%s.bin" % (size, size, blank, "-".join(str(i) for i in group))
+    return load_table(name, (size * size) ** len(group), lambda: build_pattern_database(size, group, blank))
+
+# Given a permutation of 0 - (n - 1), returns its rank (Lehmer code) among all n! permutations
+# and the parity of its number of inversions
+def permutation_rank(perm):
+    n = len(perm)
+    rank = 0
+    parity = 0
+    seen = 0
+    for i in range(n):
+        # Number of values after perm[i] that are smaller than it
+        smaller = perm[i] - (seen & ((1 << perm[i]) - 1)).bit_count()
+        rank = rank * (n - i) + smaller
+        parity ^= smaller & 1
+        seen |= 1 << perm[i]
+    return rank, parity
+
+# Given a state relabeled by index in the goal state (the blank space is labeled home, its index in the goal state),
+# returns its index in the exact distance table, or None if the goal can't be reached from it
+# States are indexed by where the blank space is, then by the rank of the order of the other tiles. The two orders that
+# only differ in their last two tiles have ranks 2k and 2k + 1 and opposite parity, and only one can be reached, so
+# rank // 2 is enough. 9 * 8! / 2 = 181440 entries for a 3x3 board
+def distance_index(perm, home, size):
+    space = perm.index(home)
+    # Every move swaps two labels and moves the blank space by one, so the parity of the inversions
+    # always matches the parity of how far the blank space is from home
+    if permutation_rank(perm)[1] != (abs(space // size - home // size) + abs(space % size - home % size)) % 2:
+        return None
+    tiles = [num if num < home else num - 1 for num in perm if num != home]
+    return space * (math.factorial(len(tiles)) // 2) + permutation_rank(tiles)[0] // 2
+
+# Builds the table of exact distances to the goal for every state of the board with a breadth first search
+# Tiles are relabeled by their index in the goal state, so the goal is 0, 1, 2, ... with the blank space at blank
+def build_distance_table(size, blank):
+    n = size * size
+    bits = tile_bits(size)
+    mask = (1 << bits) - 1
+    moves = blank_moves(size)
+    table = bytearray([255]) * (math.factorial(n) // 2)
+    goal = pack_state([[r * size + c for c in range(size)] for r in range(size)])[0]
+    table[distance_index(list(range(n)), blank, size)] = 0
+    seen = {goal}
+    frontier = [(goal, blank)]
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for state, space in frontier:
+            for move, target in moves[space]:
+                # The blank space is labeled blank rather than 0, so swap the two labels directly
+                num = (state >> (target * bits)) & mask
+                child = state ^ ((num ^ blank) << (target * bits)) ^ ((num ^ blank) << (space * bits))
+                if child not in seen:
+                    seen.add(child)
+                    table[distance_index([(child >> (i * bits)) & mask for i in range(n)], blank, size)] = depth
+                    next_frontier.append((child, target))
+        frontier = next_frontier
+    return table
+
+# Opens the exact distance table for goals with the blank space at blank
+def load_distance_table(size, blank):
+    name = "exact_%dx%d_blank%d.bin" % (size, size, blank)
+    return load_table(name, math.factorial(size * size) // 2, lambda: build_distance_table(size, blank))
+
+# Checks if the goal state can be reached from the initial state (both in list form) in O(n)
+# Every move swaps the blank space with a number, so the parity of the permutation taking the initial state
+# to the goal state has to match the parity of how far the blank space is from where it is in the goal state
+def solvable(init_state, goal_state):
+    init = [num for row in init_state for num in row]
+    goal = [num for row in goal_state for num in row]
+    if sorted(init) != list(range(len(init))) or sorted(goal) != list(range(len(init))):
+        return False
+    size = len(init_state)
+    # perm[ i ] is the index in the goal state of the number at index i
+    where = [0] * len(goal)
+    for i in range(len(goal)):
+        where[goal[i]] = i
+    perm = [where[num] for num in init]
+    # A permutation of n values with c cycles is n - c swaps away from sorted
+    cycles = 0
+    seen = [False] * len(perm)
+    for i in range(len(perm)):
+        if not seen[i]:
+            cycles += 1
+            while not seen[i]:
+                seen[i] = True
+                i = perm[i]
+    blank, home = init.index(0), goal.index(0)
+    distance = abs(blank // size - home // size) + abs(blank % size - home % size)
+    return (len(perm) - cycles) % 2 == distance % 2
+
 # Helps display the board in an easier and more readable form
 # Ex:
 # 1 2 3
@@ -66,200 +332,822 @@ def sum_manhattan(state, goal):
 
     return total
 
+# Given the [row, column] of t_k and t_j in the current and goal state, checks if they are a linear conflict
+def in_linear_conflict(tk, tj, goal_tk, goal_tj):
+    tk_r, tk_c = tk[0], tk[1]
+    tj_r, tj_c = tj[0], tj[1]
+    # Check if t_k and t_j are on the same row or column and t_j is to the right of t_k
+    on_row_init = (tj_r == tk_r and tj_c > tk_c)
+    on_col_init = (tj_c == tk_c and tj_r > tk_r)
+    if on_row_init or on_col_init:
+        # Gets the row and column of t_k and t_j in goal state
+        goal_tj_r, goal_tj_c = goal_tj[0], goal_tj[1]
+        goal_tk_r, goal_tk_c = goal_tk[0], goal_tk[1]
+        # Check if t_k and t_j are on the same row or column and t_j is to the left of t_k and in the same row or column as current state
+        on_row_goal = (goal_tj_r == goal_tk_r and goal_tj_c < goal_tk_c) and (tj_r == goal_tj_r)
+        on_col_goal = (goal_tj_c == goal_tk_c and goal_tj_r < goal_tk_r) and (tj_c == goal_tj_c)
+        if on_row_goal or on_col_goal:
+            return True
+    return False
+
 # Given board in dictionary form, returns the number of linear conflicts
 def num_linear_conflicts(state, goal):
     total = 0
 
     # First get the t_k
     for t_k in range(1, len(state)):
-        # Gets the row and column of the t_k
-        tk_r, tk_c = state[t_k][0], state[t_k][1]
         # Then get the t_j
         for t_j in range(1, len(state)):
-            tj_r, tj_c = state[t_j][0], state[t_j][1]
-            # Check if t_k and t_j are on the same row or column and t_j is to the right of t_k
-            on_row_init = (tj_r == tk_r and tj_c > tk_c)
-            on_col_init = (tj_c == tk_c and tj_r > tk_r)
-            if on_row_init or on_col_init:
-                # Gets the row and column of t_k and t_j in goal state
-                goal_tj_r, goal_tj_c = goal[t_j][0], goal[t_j][1]
-                goal_tk_r, goal_tk_c = goal[t_k][0], goal[t_k][1]
-                # Check if t_k and t_j are on the same row or column and t_j is to the left of t_k and in the same row or column as current state
-                on_row_goal = (goal_tj_r == goal_tk_r and goal_tj_c < goal_tk_c) and (tj_r == goal_tj_r)
-                on_col_goal = (goal_tj_c == goal_tk_c and goal_tj_r < goal_tk_r) and (tj_c == goal_tj_c)
-                if on_row_goal or on_col_goal:
-                    # print(t_k, t_j)
-                    total += 1
+            if in_linear_conflict(state[t_k], state[t_j], goal[t_k], goal[t_j]):
+                # print(t_k, t_j)
+                total += 1
 
     return total
 
+# Collects what a search is doing, to find where the time goes without a profiler
+# Searches only collect stats when one is given to the Puzzle (puzzle.stats), so it costs nothing by default
+# progress(stats) is called every progress_every nodes expanded
+class SearchStats:
+    def __init__(self, progress = None, progress_every = 10000):
+        self.expanded = 0
+        self.generated = 0
+        self.duplicates_pruned = 0
+        self.peak_frontier = 0
+        self.peak_explored = 0
+        self.heuristic_time = 0.0
+        self.progress = progress
+        self.progress_every = progress_every
+        self.start = time.perf_counter()
+        self.end = None
+
+    # Called when a node is expanded
+    def expand(self, generated, frontier_size, explored_size):
+        self.expanded += 1
+        self.generated = generated
+        if frontier_size > self.peak_frontier:
+            self.peak_frontier = frontier_size
+        if explored_size > self.peak_explored:
+            self.peak_explored = explored_size
+        if self.progress is not None and self.expanded % self.progress_every == 0:
+            self.progress(self)
+
+    # Called once the search is done
+    def finish(self, generated):
+        self.generated = generated
+        self.end = time.perf_counter()
+
+    def to_dict(self):
+        elapsed = (self.end or time.perf_counter()) - self.start
+        return {
+            "expanded": self.expanded,
+            "generated": self.generated,
+            "expanded_per_second": self.expanded / elapsed if elapsed else 0,
+            "generated_per_second": self.generated / elapsed if elapsed else 0,
+            "peak_frontier": self.peak_frontier,
+            "peak_explored": self.peak_explored,
+            "duplicates_pruned": self.duplicates_pruned,
+            "heuristic_seconds": self.heuristic_time,
+            "bookkeeping_seconds": elapsed - self.heuristic_time,
+            "seconds": elapsed,
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+# A node on the path of a solution, see Puzzle.node for how the search itself stores its nodes
 class Node:
-    def __init__(self, state, goal, move = None, parent = None, option = 1):
+    # No __dict__ for each node, just these fields
+    __slots__ = ("parent", "depth", "state", "blank", "move", "h", "cost")
+
+    def __init__(self, state, blank, h, move = None, parent = None, weight = 1):
         # What is the node's parent? Root node's parent is None
         self.parent = parent
         # Child node's depth is 1 more than parent's
         self.depth = 0 if parent is None else parent.depth + 1
-        # States are in dictionary form to easily calculate cost
+        # States are packed into integers (see pack_state) so they are cheap to copy and hash
         self.state = state
+        # Index of the blank space in the board, cached so it doesn't have to be searched for
+        self.blank = blank
         # Moves are U, D, L, R
         self.move = move
-        self.cost = self.cost_function(goal, option)
+        # Heuristic value h(n) of the state
+        self.h = h
+        self.cost = self.cost_function(weight)
 
     # Cost function is f(n) = g(n) + h(n)
-    def cost_function(self, goal, option):
-        #       g(n)      +     h(n)
-        cost = self.depth + sum_manhattan(self.state, goal)
-        # if linear conflicts are also chosen, just add that to cost
-        if option == 2:
-            cost += 2 * num_linear_conflicts(self.state, goal)
-        return cost
-
-    # For node == other node
-    def __eq__(self, other):
-        return self.cost == other.cost
-
-    # For node < other node
-    def __lt__(self, other):
-        return self.cost < other.cost
-
-    # For node > other node
-    def __gt__(self, other):
-        return self.cost > other.cost
-
-    # For node <= other node
-    def __le__(self, other):
-        return self < other or self == other
-
-    # For node >= other node
-    def __ge__(self, other):
-        return self > other or self == other
-
-    # For node != other node
-    def __ne__(self, other):
-        return not (self == other)
+    # Weighted A* uses f(n) = g(n) + w x h(n), which trusts h(n) more to find a solution sooner
+    def cost_function(self, weight = 1):
+        if weight != 1:
+            return self.depth + weight * self.h
+        #       g(n)    +  h(n)
+        return self.depth + self.h
 
 class Puzzle:
     def __init__(self, initial_state, goal):
-        # Uses Priority Queue to quickly get the next node with lowest cost
-        self.frontier = PriorityQueue()
-        # Graph Search, so store visited states
-        self.explored = []
-        # Store initial and goal states as dictionary form
-        self.state = list_to_dict(initial_state)
+        self.reset_search()
+        # Length of a row of the board and the number of bits used for each tile
+        self.size = len(goal)
+        self.bits = tile_bits(self.size)
+        # Store initial and goal states in packed form
+        self.state, self.blank = pack_state(initial_state)
+        self.goal_state = pack_state(goal)[0]
+        # Goal is also stored as dictionary form to calculate the heuristics
         self.goal = list_to_dict(goal)
+        # [row, column] of each number in the goal state and of each index of the board
+        self.goal_positions = [tuple(self.goal[num]) for num in range(self.size * self.size)]
+        self.cell_positions = [(i // self.size, i % self.size) for i in range(self.size * self.size)]
+        # Indexes sharing a row or column with each index, the only places a linear conflict can come from
+        self.lines = board_lines(self.size)
+        # Pattern databases, only loaded if they are used (see load_pattern_databases)
+        self.patterns = None
+        self.tile_pattern = None
+        # Moves available for each position of the blank space
+        self.moves = blank_moves(self.size)
         # Total number of nodes generated
         self.nodes_gen = 0
+        # Set if the search ran out of time or nodes before finding a solution
+        self.stopped = False
+        # The solution found is at most bound times as long as the shortest solution, None if that isn't known
+        self.bound = 1
+        # SearchStats to fill in, if any
+        self.stats = None
+
+    # Clears the frontier, explored set and nodes for a new search
+    def reset_search(self):
+        # Heap of (f(n), h(n), index of the node), so the next node is the one with the lowest cost, then among those
+        # the one closest to the goal by h(n), then the one generated first. Tuples compare without calling Python code
+        self.frontier = []
+        # Graph Search, so store visited states (packed states are ints, so a set gives O(1) lookups)
+        self.explored = set()
+        # Lowest depth each state in the frontier has been reached with, to skip duplicate children
+        self.frontier_depth = dict()
+        # Nodes generated by the search, node i is made of the i-th item of each list (see new_node)
+        # The parent of a node is the index of the parent node (-1 for the root), so nodes don't need to be objects
+        self.node_state = []
+        self.node_move = []
+        self.node_blank = array("i")
+        self.node_h = array("i")
+        self.node_depth = array("i")
+        self.node_parent = array("i")
+        # Packed indexes of the pattern database tables of each node with option 3, 0 otherwise (see pattern_index)
+        self.node_pattern = array("q")
+
+    # Adds a node to the nodes of the search and returns its index
+    def new_node(self, state, blank, h, move = None, parent = -1, pattern = 0):
+        self.node_state.append(state)
+        self.node_move.append(move)
+        self.node_blank.append(blank)
+        self.node_h.append(h)
+        self.node_depth.append(0 if parent < 0 else self.node_depth[parent] + 1)
+        self.node_parent.append(parent)
+        self.node_pattern.append(pattern)
+        return len(self.node_state) - 1
+
+    # Creates the Node of the node at index and of every node on the path to it, so the path can be output
+    def node(self, index, weight = 1):
+        path = []
+        while index >= 0:
+            path.append(index)
+            index = self.node_parent[index]
+        node = None
+        for i in reversed(path):
+            node = Node(self.node_state[i], self.node_blank[i], self.node_h[i], self.node_move[i], node, weight)
+        return node
 
     # Test to see if the state of the node is the goal state
     def goal_test(self, node_state):
-        for num in node_state:
-            if node_state[num][0] != self.goal[num][0] or node_state[num][1] != self.goal[num][1]:
-                return False
-        return True
-
-    # For each possible move, check if we can add the new state to the frontier
-    def add_child(self, l, parent, move, option):
-        # Generates child node of parent
-        child = Node(list_to_dict(l), self.goal, move, parent, option)
-        # Check if we visited this state before
-        if l not in self.explored:
-            # print(child.cost, child)
-            # print(self.frontier.queue)
-            self.frontier.put(child)
-            self.nodes_gen += 1
+        return node_state == self.goal_state
+
+    # Loads the pattern databases for the goal state
+    # Each tile is relabeled by its index in the goal state, so a database is shared by all goals with the blank space in the same place
+    def load_pattern_databases(self):
+        if self.patterns is not None:
+            return
+        if self.size > 4:
+            raise ValueError("Pattern databases are only available for boards up to 4x4")
+        cells = self.size * self.size
+        goal_tiles = [num for row in unpack_state(self.goal_state, self.size) for num in row]
+        blank = goal_tiles.index(0)
+        groups = pattern_groups(self.size, blank)
+        # Bits of each group's table index in a packed index (see pattern_index)
+        self.pattern_bits = (cells ** max(len(group) for group in groups) - 1).bit_length()
+        self.patterns = []
+        # tile_pattern[ num ] = [group number, weight of num in the group's table index]
+        self.tile_pattern = [None] * cells
+        for group in groups:
+            tiles = [goal_tiles[i] for i in group]
+            weights = [cells ** i for i in range(len(group))]
+            for i in range(len(tiles)):
+                self.tile_pattern[tiles[i]] = [len(self.patterns), weights[i]]
+            self.patterns.append((tiles, weights, load_pattern_database(self.size, group, blank)))
 
-    # Given a node, determine the next, best state to go
-    def next_state(self, node, option):
-        l = dict_to_list(node.state)
+    # Given board in positions form, returns the sum of the pattern databases of each group
+    def pattern_heuristic(self, positions):
+        total = 0
+        for tiles, weights, table in self.patterns:
+            index = 0
+            for i in range(len(tiles)):
+                r, c = positions[tiles[i]]
+                index += (r * self.size + c) * weights[i]
+            total += table[index]
+        return total
+
+    # Returns the index of every group's table for the packed state packed into one int, group g's in the pattern_bits
+    # bits from g * pattern_bits, or 0 if option isn't 3. A search keeps it for each node, so a move only changes one
+    # group's index and the tiles don't have to be looked for (see pattern_delta)
+    def pattern_index(self, state, option):
+        if option != 3:
+            return 0
+        self.load_pattern_databases()
+        mask = (1 << self.bits) - 1
+        pattern = 0
+        for i in range(self.size * self.size):
+            num = (state >> (i * self.bits)) & mask
+            if num != 0:
+                group, weight = self.tile_pattern[num]
+                pattern += i * weight << (group * self.pattern_bits)
+        return pattern
+
+    # Returns h(n) of the packed state
+    def heuristic(self, state, option):
+        positions = state_positions(state, self.size)
+        if option == 3:
+            self.load_pattern_databases()
+            return self.pattern_heuristic(positions)
+        h = sum_manhattan(positions, self.goal)
+        # if linear conflicts are also chosen, just add that to the heuristic
+        if option == 2:
+            h += 2 * num_linear_conflicts(positions, self.goal)
+        return h
+
+    # Number of linear conflicts between num at index i and the other numbers in its row and column
+    def tile_conflicts(self, state, num, i):
+        mask = (1 << self.bits) - 1
+        pos, goal = self.cell_positions[i], self.goal_positions[num]
+        total = 0
+        for j in self.lines[i]:
+            other = (state >> (j * self.bits)) & mask
+            if other != 0:
+                other_pos, other_goal = self.cell_positions[j], self.goal_positions[other]
+                total += in_linear_conflict(pos, other_pos, goal, other_goal) + in_linear_conflict(other_pos, pos, other_goal, goal)
+        return total
+
+    # Returns how much h(n) changes when num slides from index frm (in parent_state) to index to (in state)
+    # Only the moved number changes position, so only its Manhattan distance and the
+    # linear conflicts in its old and new row and column need to be looked at
+    # Option 3 has to find the group's tiles in parent_state first, so searches keep the packed index of each node
+    # and use pattern_delta instead
+    def heuristic_delta(self, parent_state, state, num, frm, to, option):
+        if option == 3:
+            return self.pattern_delta(self.pattern_index(parent_state, option), num, frm, to)[0]
+        (goal_r, goal_c), (old_r, old_c), (new_r, new_c) = self.goal_positions[num], self.cell_positions[frm], self.cell_positions[to]
+        delta = abs(goal_r - new_r) + abs(goal_c - new_c) - abs(goal_r - old_r) - abs(goal_c - old_c)
+        if option == 2:
+            delta += 2 * (self.tile_conflicts(state, num, to) - self.tile_conflicts(parent_state, num, frm))
+        return delta
+
+    # Returns how much h(n) changes when num slides from index frm to index to, and the packed index of the child
+    # Only the table of the moved number's group changes, and its index by the move times num's weight in it
+    def pattern_delta(self, pattern, num, frm, to):
+        group, weight = self.tile_pattern[num]
+        table = self.patterns[group][2]
+        shift = group * self.pattern_bits
+        index = (pattern >> shift) & ((1 << self.pattern_bits) - 1)
+        return table[index + (to - frm) * weight] - table[index], pattern + ((to - frm) * weight << shift)
+
+    # Returns h(n) and the packed pattern database index (see pattern_index) of the child, from those of its parent
+    # (add_child and bounded_search do the same without the extra call)
+    def child_heuristic(self, parent_state, state, num, frm, to, option, h, pattern):
+        if option == 3:
+            delta, pattern = self.pattern_delta(pattern, num, frm, to)
+            return h + delta, pattern
+        return h + self.heuristic_delta(parent_state, state, num, frm, to, option), 0
+
+    # For each possible move, check if we can add the new state to the frontier, parent is the index of the node
+    # Children with g(n) + h(n) of at least limit are skipped (they can't lead to a solution shorter than limit)
+    def add_child(self, parent, move, target, option, weight = 1, limit = None):
+        parent_state = self.node_state[parent]
+        parent_blank = self.node_blank[parent]
+        # Slides the tile at target into the blank space
+        state, num = move_tile(parent_state, parent_blank, target, self.bits)
+        depth = self.node_depth[parent] + 1
+        # Check if we visited this state before, or it is already waiting in the frontier with a lower depth
+        if state in self.explored or self.frontier_depth.get(state, depth + 1) <= depth:
+            if self.stats is not None:
+                self.stats.duplicates_pruned += 1
+            return
+        # Generates child node of parent, updating the parent's h(n) (and pattern database index) rather than computing it from scratch
+        if self.stats is not None:
+            start = time.perf_counter()
+        if option == 3:
+            delta, pattern = self.pattern_delta(self.node_pattern[parent], num, target, parent_blank)
+        else:
+            delta, pattern = self.heuristic_delta(parent_state, state, num, target, parent_blank, option), 0
+        h = self.node_h[parent] + delta
+        if self.stats is not None:
+            self.stats.heuristic_time += time.perf_counter() - start
+        if limit is not None and depth + h >= limit:
+            return
+        self.frontier_depth[state] = depth
+        child = self.new_node(state, target, h, move, parent, pattern)
+        heappush(self.frontier, (depth + h if weight == 1 else depth + weight * h, h, child))
+        self.nodes_gen += 1
+
+    # Given the index of a node, determine the next, best state to go
+    # Returns the index of its node, or None if there are no states left in the frontier
+    def next_state(self, node, option, weight = 1, limit = None):
         # Add the state to explored set
-        self.explored.append(deepcopy(l))
-        # Get the position of the blank space
-        row, col = node.state[0][0], node.state[0][1]
-        # Check for all available moves
-        if row > 0:
-            move = "U"
-            l[row][col], l[row - 1][col] = l[row - 1][col], l[row][col]
-            self.add_child(l, node, move, option)
-            l = deepcopy(self.explored[-1])
-        if row < (len(l) - 1):
-            move = "D"
-            l[row][col], l[row + 1][col] = l[row + 1][col], l[row][col]
-            self.add_child(l, node, move, option)
-            l = deepcopy(self.explored[-1])
-        if col > 0:
-            move = "L"
-            l[row][col], l[row][col - 1] = l[row][col - 1], l[row][col]
-            self.add_child(l, node, move, option)
-            l = deepcopy(self.explored[-1])
-        if col < (len(l) - 1):
-            move = "R"
-            l[row][col], l[row][col + 1] = l[row][col + 1], l[row][col]
-            self.add_child(l, node, move, option)
-            l = deepcopy(self.explored[-1])
+        self.explored.add(self.node_state[node])
+        if self.stats is not None:
+            self.stats.expand(self.nodes_gen, len(self.frontier), len(self.explored))
+        # Check for all available moves of the blank space
+        for move, target in self.moves[self.node_blank[node]]:
+            self.add_child(node, move, target, option, weight, limit)
         # Out of all available states, move to state with cheapest cost
-        return self.frontier.get()
+        # Skip states that were reached again with a lower depth and already expanded
+        while self.frontier:
+            node = heappop(self.frontier)[2]
+            state = self.node_state[node]
+            if state not in self.explored:
+                self.frontier_depth.pop(state, None)
+                return node
+        return None
+
+    # Given the moves of the blank space from the initial state, creates the nodes along the path
+    # and returns the last one, so the path can be output just like the result of the A* search
+    def path_to_node(self, moves, option):
+        node = Node(self.state, self.blank, self.heuristic(self.state, option))
+        for move in moves:
+            target = dict(self.moves[node.blank])[move]
+            state, num = move_tile(node.state, node.blank, target, self.bits)
+            h = node.h + self.heuristic_delta(node.state, state, num, target, node.blank, option)
+            node = Node(state, target, h, move, node)
+        return node
+
+    # Depth first search that cuts off any node with f(n) = g(n) + h(n) over the threshold
+    # The board is moved in place (self.ida_state) and moved back once the child is searched
+    # pattern is the packed pattern database index of the board (see pattern_index)
+    # Returns True if the goal was found, otherwise the lowest f(n) that went over the threshold
+    def bounded_search(self, depth, h, threshold, previous, path, option, pattern = 0):
+        cost = depth + h
+        if cost > threshold:
+            return cost
+        if self.goal_test(self.ida_state):
+            return True
+        minimum = float("inf")
+        blank = self.ida_blank
+        if self.stats is not None:
+            # The frontier of IDA* is just the path being searched
+            self.stats.expand(self.nodes_gen, depth, 0)
+        for move, target in self.moves[blank]:
+            # Moving the blank space back to where it just was only undoes the last move
+            if target == previous:
+                continue
+            parent_state = self.ida_state
+            # Do the move
+            self.ida_state, num = move_tile(parent_state, blank, target, self.bits)
+            self.ida_blank = target
+            self.nodes_gen += 1
+            path.append(move)
+            if self.stats is not None:
+                start = time.perf_counter()
+            if option == 3:
+                delta, child_pattern = self.pattern_delta(pattern, num, target, blank)
+            else:
+                delta, child_pattern = self.heuristic_delta(parent_state, self.ida_state, num, target, blank, option), 0
+            child_h = h + delta
+            if self.stats is not None:
+                self.stats.heuristic_time += time.perf_counter() - start
+            result = self.bounded_search(depth + 1, child_h, threshold, blank, path, option, child_pattern)
+            if result is True:
+                return True
+            # Undo the move
+            path.pop()
+            self.ida_state = move_tile(self.ida_state, target, blank, self.bits)[0]
+            self.ida_blank = blank
+            minimum = min(minimum, result)
+        return minimum
+
+    # IDA* search for puzzle
+    # Memory used only grows with the depth of the solution, so it can be used on larger boards
+    def ida_search(self, option = 1):
+        self.ida_state, self.ida_blank = self.state, self.blank
+        h = self.heuristic(self.state, option)
+        pattern = self.pattern_index(self.state, option)
+        self.nodes_gen += 1
+        threshold = h
+        path = []
+        # Each iteration raises the threshold to the lowest f(n) that was cut off in the last one
+        while True:
+            result = self.bounded_search(0, h, threshold, None, path, option, pattern)
+            if result is True:
+                return self.path_to_node(path, option)
+            threshold = result
+
+    # Breadth first search from the initial state until there are at least count states on the frontier
+    # Returns (moves, None) if the goal is found on the way, otherwise (None, frontier) where each state on the
+    # frontier is (state, blank space, h(n), previous blank space, moves from the initial state), all at the same depth
+    def split_frontier(self, count, option):
+        frontier = [(self.state, self.blank, self.heuristic(self.state, option), None, [])]
+        self.nodes_gen += 1
+        while True:
+            for state, blank, h, previous, moves in frontier:
+                if self.goal_test(state):
+                    return moves, None
+            if len(frontier) >= count:
+                return None, frontier
+            next_frontier = []
+            for state, blank, h, previous, moves in frontier:
+                for move, target in self.moves[blank]:
+                    if target == previous:
+                        continue
+                    child, num = move_tile(state, blank, target, self.bits)
+                    self.nodes_gen += 1
+                    child_h = h + self.heuristic_delta(state, child, num, target, blank, option)
+                    next_frontier.append((child, target, child_h, blank, moves + [move]))
+            frontier = next_frontier
+
+    # IDA* search split across a pool of worker processes
+    # The top of the search tree is split into a few subtrees for each worker, and every iteration searches
+    # all of them with the same threshold at the same time. The next threshold is the lowest f(n) cut off in any of them
+    # Every subtree is at the same depth, so any solution within the threshold is a shortest one. The first one found
+    # stops the others, so it may not be the same solution ida_search finds if there is more than one
+    def parallel_ida_search(self, option = 1, workers = None):
+        workers = workers or os.cpu_count()
+        moves, frontier = self.split_frontier(workers * 8, option)
+        if moves is not None:
+            return self.path_to_node(moves, option)
+        depth = len(frontier[0][4])
+        threshold = min(depth + h for state, blank, h, previous, moves in frontier)
+        init_state = unpack_state(self.state, self.size)
+        goal_state = unpack_state(self.goal_state, self.size)
+        with multiprocessing.Pool(workers, init_subtree_worker, (init_state, goal_state, option)) as pool:
+            while True:
+                tasks = [(k, state, blank, depth, h, previous, threshold) for k, (state, blank, h, previous, moves) in enumerate(frontier)]
+                minimum = float("inf")
+                for k, result, nodes in pool.imap_unordered(search_subtree, tasks):
+                    self.nodes_gen += nodes
+                    if isinstance(result, list):
+                        pool.terminate()
+                        return self.path_to_node(frontier[k][4] + result, option)
+                    minimum = min(minimum, result)
+                threshold = minimum
+
+    # Exact number of moves from the packed state to the goal, or None if the goal can't be reached
+    # label[ num ] is the index of num in the goal state (see build_distance_table)
+    def exact_distance(self, state, label, table):
+        mask = (1 << self.bits) - 1
+        index = distance_index([label[(state >> (i * self.bits)) & mask] for i in range(self.size * self.size)], label[0], self.size)
+        if index is None:
+            return None
+        return table[index]
+
+    # Solves the puzzle with the exact distance table, always moving to a state one move closer to the goal
+    # Only for boards up to 3x3, the table of a 4x4 board would be far too big
+    def table_search(self):
+        if self.size > 3:
+            raise ValueError("Exact distance tables are only available for boards up to 3x3")
+        label = [0] * (self.size * self.size)
+        for num in range(self.size * self.size):
+            label[num] = self.goal_positions[num][0] * self.size + self.goal_positions[num][1]
+        table = load_distance_table(self.size, label[0])
+        distance = self.exact_distance(self.state, label, table)
+        self.nodes_gen += 1
+        if distance is None:
+            return None
+        # h(n) is exact, so every node on the path has the same cost
+        node = Node(self.state, self.blank, distance)
+        while distance > 0:
+            for move, target in self.moves[node.blank]:
+                state = move_tile(node.state, node.blank, target, self.bits)[0]
+                self.nodes_gen += 1
+                if self.exact_distance(state, label, table) == distance - 1:
+                    distance -= 1
+                    node = Node(state, target, distance, move, node)
+                    break
+        return node
+
+    # Bidirectional heuristic search for puzzle (DIBBS, Sewell and Jacobson 2021)
+    # Searches forward from the initial state and backward from the goal state (the backward search is
+    # just a Puzzle going from the goal state to the initial state). Each side orders its nodes by
+    # 2 x g(n) + h(n) - h'(n), where h'(n) estimates the way back to where that side started: h(n) - h'(n) is how much
+    # closer to the other side than to its own start the node looks, so both sides head for the middle and meet there
+    # Any path still to be found goes through a node on each side, so it is at least half the sum of the lowest values
+    # of both sides, and the search stops as soon as that reaches the best path found, usually right after they meet
+    # This only holds if h(n) never overestimates and never drops by more than 1 in a move, so option 2 is not allowed
+    def bidirectional_search(self, option = 1):
+        if option not in EXACT_OPTIONS:
+            raise ValueError("Bidirectional search needs a heuristic that never overestimates, use option 1 or 3")
+        backward = Puzzle(unpack_state(self.goal_state, self.size), unpack_state(self.state, self.size))
+        searches = [self, backward]
+        # Index of the node with the lowest depth found for each state, for each side
+        reached = [dict(), dict()]
+        # h'(n) of every node of each side and its packed pattern database index, by index like the other node lists (see new_node)
+        back_h = [array("i"), array("i")]
+        back_pattern = [array("q"), array("q")]
+        for side in range(2):
+            search = searches[side]
+            h = search.heuristic(search.state, option)
+            h_back = searches[1 - side].heuristic(search.state, option)
+            node = search.new_node(search.state, search.blank, h, pattern = search.pattern_index(search.state, option))
+            back_h[side].append(h_back)
+            back_pattern[side].append(searches[1 - side].pattern_index(search.state, option))
+            heappush(search.frontier, (h - h_back, h, node))
+            reached[side][search.state] = node
+            self.nodes_gen += 1
+        if self.goal_test(self.state):
+            return self.path_to_node([], option)
+
+        # Length of the shortest path found so far, and the two nodes where it meets
+        best, meeting = float("inf"), None
+        while True:
+            # Drop states that were reached again with a lower depth and already expanded, so the lowest values are right
+            for search in searches:
+                while search.frontier and search.node_state[search.frontier[0][2]] in search.explored:
+                    heappop(search.frontier)
+            if not self.frontier or not backward.frontier or 2 * best <= self.frontier[0][0] + backward.frontier[0][0]:
+                break
+            # Expand the side with the lowest value
+            side = 0 if self.frontier[0][0] <= backward.frontier[0][0] else 1
+            search = searches[side]
+            other_search = searches[1 - side]
+            node = heappop(search.frontier)[2]
+            node_state, node_blank, node_h, node_back_h = search.node_state[node], search.node_blank[node], search.node_h[node], back_h[side][node]
+            search.explored.add(node_state)
+            depth = search.node_depth[node] + 1
+            for move, target in search.moves[node_blank]:
+                state, num = move_tile(node_state, node_blank, target, search.bits)
+                if state in search.explored or (state in reached[side] and search.node_depth[reached[side][state]] <= depth):
+                    continue
+                h, pattern = search.child_heuristic(node_state, state, num, target, node_blank, option, node_h, search.node_pattern[node])
+                # A path through the child can't be shorter than the best one found
+                if depth + h >= best:
+                    continue
+                h_back, pattern_back = other_search.child_heuristic(node_state, state, num, target, node_blank, option, node_back_h, back_pattern[side][node])
+                value = 2 * depth + h - h_back
+                # Same with the lowest value of the other side
+                if other_search.frontier and value + other_search.frontier[0][0] >= 2 * best:
+                    continue
+                child = search.new_node(state, target, h, move, node, pattern)
+                back_h[side].append(h_back)
+                back_pattern[side].append(pattern_back)
+                reached[side][state] = child
+                heappush(search.frontier, (value, h, child))
+                self.nodes_gen += 1
+                # The two searches met, check if it's a shorter path
+                other = reached[1 - side].get(state)
+                if other is not None and depth + other_search.node_depth[other] < best:
+                    best = depth + other_search.node_depth[other]
+                    meeting = (child, other) if side == 0 else (other, child)
+
+        if meeting is None:
+            return None
+        # Moves to the meeting state, then the backward search's moves undone in reverse order
+        moves = solution_path(self.node(meeting[0]))[0] + [OPPOSITE[move] for move in reversed(solution_path(backward.node(meeting[1]))[0])]
+        return self.path_to_node(moves, option)
+
+    # Anytime search for puzzle: runs weighted A* starting at weight, then again with the weight lowered by step
+    # each time (only looking for shorter solutions than the best so far) until the weight reaches 1
+    # or the time (deadline, from time.perf_counter) or nodes run out. Returns the best solution found
+    def anytime_search(self, option = 1, weight = 3, step = 0.5, deadline = None, max_nodes = None):
+        best = None
+        while True:
+            # Start a new search, but keep counting nodes generated
+            self.reset_search()
+            node = self.search(option, weight, deadline, max_nodes, None if best is None else best.depth)
+            if self.stopped:
+                break
+            if node is not None:
+                best = node
+                # Weighted A* finds solutions at most weight times longer than the shortest
+                self.bound = weight
+            if weight == 1:
+                # A* found no shorter solution (or found the shortest), so the best so far is the shortest
+                # A pass with a higher weight finding nothing doesn't prove that, since explored states are
+                # never reopened when they are reached again with a lower depth, so it goes on with a lower weight
+                self.bound = 1
+                break
+            weight = max(1, weight - step)
+        self.stopped = self.stopped and best is None
+        return best
 
     # A* search for puzzle
-    def search(self, option = 1):
+    # With weight, f(n) = g(n) + weight x h(n). The search stops (returning None and setting self.stopped) once
+    # time.perf_counter() passes deadline or max_nodes nodes have been generated
+    def search(self, option = 1, weight = 1, deadline = None, max_nodes = None, limit = None):
         # Create root node for Graph Search
-        node = Node(self.state, self.goal, None, None, option)
+        node = self.new_node(self.state, self.blank, self.heuristic(self.state, option), pattern = self.pattern_index(self.state, option))
         self.nodes_gen += 1
         # If this state is not the goal state
-        while not self.goal_test(node.state):
-            node = self.next_state(node, option)
-        return node
+        while not self.goal_test(self.node_state[node]):
+            if (deadline is not None and time.perf_counter() > deadline) or (max_nodes is not None and self.nodes_gen >= max_nodes):
+                self.stopped = True
+                return None
+            node = self.next_state(node, option, weight, limit)
+            # No states left to search
+            if node is None:
+                return None
+        return self.node(node, weight)
 
-def main(user_input):
-    # Gets initial and goal state from input file
-    init_state, goal_state = parse(user_input[0])
-    # Create output string
-    output = [output_puzzle(init_state), "\n", output_puzzle(goal_state), "\n"]
-    #Solve the puzzle
+# Puzzle and heuristic option of the worker processes of parallel_ida_search, so the pattern databases are only loaded once per process
+subtree_puzzle = None
+subtree_option = None
+
+def init_subtree_worker(init_state, goal_state, option):
+    global subtree_puzzle, subtree_option
+    subtree_puzzle = Puzzle(init_state, goal_state)
+    subtree_option = option
+    # Loads the pattern databases before the first subtree comes in
+    subtree_puzzle.heuristic(subtree_puzzle.state, option)
+
+# Searches one subtree of parallel_ida_search in a worker process with the puzzle's option
+# Returns (k, moves from the root of the subtree to the goal or the lowest f(n) cut off, nodes generated)
+def search_subtree(task):
+    k, state, blank, depth, h, previous, threshold = task
+    puzzle = subtree_puzzle
+    puzzle.nodes_gen = 0
+    puzzle.ida_state, puzzle.ida_blank = state, blank
+    path = []
+    result = puzzle.bounded_search(depth, h, threshold, previous, path, subtree_option, puzzle.pattern_index(state, subtree_option))
+    return k, path if result is True else result, puzzle.nodes_gen
+
+# Search modes that find a shortest solution when h(n) never overestimates, so any of them can answer from the same cached solution
+EXACT_MODES = ["astar", "ida", "pida", "table", "bidir"]
+# Heuristic options that never overestimate. Option 2 adds 2 for every pair of tiles in linear conflict, so a tile in
+# conflict with more than one other tile is counted more than once and the solution found may not be a shortest one
+EXACT_OPTIONS = [1, 3]
+
+# Whether the mode always finds a shortest solution with the heuristic option (the table doesn't use the heuristic)
+def exact_search(mode, option):
+    return mode == "table" or (mode in EXACT_MODES and option in EXACT_OPTIONS)
+
+# Key of the puzzle in a SolutionCache (see cache.py), the same for puzzles that only differ by what the tiles are called
+# Tiles are relabeled by their index in the goal state, so only the relabeled initial state and where the blank space
+# goes are left. The moves of a solution are moves of the blank space, so they solve every puzzle with the same key
+def puzzle_key(init_state, goal_state):
+    size = len(goal_state)
+    goal = [num for row in goal_state for num in row]
+    label = [0] * (size * size)
+    for i in range(size * size):
+        label[goal[i]] = i
+    return "%d:%d:%s" % (size, goal.index(0), ",".join(str(label[num]) for row in init_state for num in row))
+
+# Solves the puzzle with the heuristic option and search mode (astar, ida, pida, table, bidir, weighted or anytime)
+# weight, seconds and max_nodes are only used by weighted and anytime, workers is the number of processes for pida
+# (default: number of CPUs), stats is a SearchStats to fill in
+# With a SolutionCache, the shortest solution is looked up first when the search is exact (see exact_search), and a hit
+# is answered without searching (no nodes are generated)
+# Returns the puzzle (which counted the nodes generated) and the goal node, or None as the goal node if there is no solution
+def solve(init_state, goal_state, option = 1, mode = "astar", weight = 2, seconds = None, max_nodes = None, workers = None, stats = None, cache = None):
     puzzle = Puzzle(init_state, goal_state)
-    goal_node = puzzle.search(user_input[1])
-    # Addes the depth and nodes generated to output string
-    output.append(str(goal_node.depth) + "\n" + str(puzzle.nodes_gen) + "\n")
+    puzzle.stats = stats
+    # Don't bother searching if the goal can't be reached
+    if not solvable(init_state, goal_state):
+        return puzzle, None
+    if cache is not None and exact_search(mode, option):
+        key = puzzle_key(init_state, goal_state)
+        hit, moves = cache.get(key)
+        if hit:
+            goal_node = puzzle.path_to_node(moves, option)
+        else:
+            puzzle, goal_node = solve(init_state, goal_state, option, mode, workers = workers, stats = stats)
+            cache.put(key, solution_path(goal_node)[0])
+            return puzzle, goal_node
+    elif mode == "ida":
+        goal_node = puzzle.ida_search(option)
+    elif mode == "pida":
+        goal_node = puzzle.parallel_ida_search(option, workers)
+    elif mode == "table":
+        goal_node = puzzle.table_search()
+    elif mode == "bidir":
+        goal_node = puzzle.bidirectional_search(option)
+    elif mode == "weighted" or mode == "anytime":
+        deadline = None if seconds is None else time.perf_counter() + seconds
+        if mode == "weighted":
+            goal_node = puzzle.search(option, weight, deadline, max_nodes)
+            puzzle.bound = weight
+        else:
+            goal_node = puzzle.anytime_search(option, weight, 0.5, deadline, max_nodes)
+        # The bound only holds if h(n) never overestimates, option 2 can be off by more than the weight
+        if option not in EXACT_OPTIONS:
+            puzzle.bound = None
+    else:
+        goal_node = puzzle.search(option)
+    if stats is not None:
+        stats.finish(puzzle.nodes_gen)
+    return puzzle, goal_node
+
+# Goes from the leaf to the root node, and returns the moves and costs of the nodes along the path in order
+def solution_path(goal_node):
     moves = []
     costs = []
-    # Goes from the leaf to the root node
     node = goal_node
     while node is not None:
-        # print(output_puzzle(dict_to_list(node.state)))
         # Gets the move of the node
         if node.move is not None:
-            moves.append(node.move + " ")
+            moves.append(node.move)
         # Gets the cost of the node
-        costs.append(str(node.cost) + " ")
+        costs.append(node.cost)
         node = node.parent
+    return moves[::-1], costs[::-1]
 
-    output.append("".join(moves[::-1]) + "\n")
-    output.append("".join(costs[::-1]))
+# Solves the puzzle in the input file and returns the output, user_input is [filename, option, mode, weight, time limit, max nodes, workers]
+# quiet skips printing, so it can be called from other code and only the returned output is used
+# cache is a SolutionCache to look the solution up in first (see solve)
+def main(user_input, stats = None, quiet = False, cache = None):
+    # Gets initial and goal state from input file
+    init_state, goal_state = parse(user_input[0])
+    # Create output string
+    output = [output_puzzle(init_state), "\n", output_puzzle(goal_state), "\n"]
+    #Solve the puzzle
+    mode = user_input[2] if len(user_input) > 2 else "astar"
+    # Weighted and anytime modes also take the weight, time limit and node limit, pida takes the number of workers
+    limits = user_input[3:]
+    start = time.perf_counter()
+    puzzle, goal_node = solve(init_state, goal_state, user_input[1], mode, *limits, stats = stats, cache = cache)
+    elapsed = time.perf_counter() - start
+    if goal_node is None and puzzle.stopped:
+        output.append("No solution was found within the limits.\n")
+        output = "".join(output)
+        if not quiet:
+            print(output)
+        return output
+    # The goal can't be reached from the initial state
+    if goal_node is None:
+        output.append("This puzzle does not have a solution.\n")
+        output = "".join(output)
+        if not quiet:
+            print(output)
+        return output
+    # Addes the depth and nodes generated to output string
+    output.append(str(goal_node.depth) + "\n" + str(puzzle.nodes_gen) + "\n")
+    moves, costs = solution_path(goal_node)
+    output.append("".join(move + " " for move in moves) + "\n")
+    output.append("".join("%g " % cost for cost in costs))
+    # Weighted and anytime modes also add how far from the shortest solution it could be and how long it took
+    if mode == "weighted" or mode == "anytime":
+        output.append("\n%s\n%.6f" % ("unknown" if puzzle.bound is None else "%g" % puzzle.bound, elapsed))
     output = "".join(output)
-    print(output)
+    if not quiet:
+        print(output)
     return output
 
-user_input = []
-if len(sys.argv) < 2:
-    user_input.append(input("Please enter the name of input file:\n"))
-else:
-    user_input.append(sys.argv[1])
-
-if len(sys.argv) < 3:
-    val = 0
-    while not val or val > 2:
-         val = int(input("Select:\n 1: Sum of Manhattan distances\n 2: Sum of Manhattan distances + 2 x # linear conflicts\n"))
-    print()
-    user_input.append(val)
-else:
-    user_input.append(int(sys.argv[2]))
-
-output = main(user_input)
-
-# Given name of the input file, create the correct filename of output file
-filename = user_input[0].split(".")
-if "input" in filename[0].lower():
-    num = filename[0].lower().split("input")[1]
-    letter = "A" if user_input[1] == 1 else "B"
-    filename[0] = "Output" + num + "_" + letter
-
-open(".".join(filename), "w").write(output)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solves the number shifter puzzle in the input file")
+    parser.add_argument("input", nargs="?", help="name of input file")
+    parser.add_argument("option", nargs="?", type=int, choices=[1, 2, 3], help="1: Sum of Manhattan distances, 2: Sum of Manhattan distances + 2 x # linear conflicts, 3: Additive pattern database (boards up to 4x4)")
+    parser.add_argument("--mode", choices=["astar", "ida", "pida", "table", "bidir", "weighted", "anytime"], default="astar", help="astar: A* search (default), ida: IDA* search, uses far less memory on larger boards, pida: IDA* search split across worker processes, table: exact distance table (boards up to 3x3), bidir: bidirectional search meeting in the middle (options 1 and 3 only), weighted: weighted A* search, anytime: weighted A* searches with the weight lowered until time runs out. The last two also output the bound on how many times longer than the shortest solution the solution is (unknown with option 2), and the time taken")
+    parser.add_argument("--weight", type=float, default=2, help="weight of h(n) for weighted and anytime (default 2)")
+    parser.add_argument("--time-limit", type=float, default=None, help="seconds weighted and anytime can search for")
+    parser.add_argument("--max-nodes", type=int, default=None, help="nodes weighted and anytime can generate")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes for pida (default: number of CPUs)")
+    parser.add_argument("--cache", metavar="FILE", help="sqlite file of solutions to look the puzzle up in first, and to save the solution in (only for searches that find a shortest solution: options 1 and 3, not weighted and anytime)")
+    parser.add_argument("--stats", action="store_true", help="print search stats as JSON to stderr")
+    parser.add_argument("--progress", type=int, default=None, metavar="N", help="print search stats as JSON to stderr every N nodes expanded")
+    args = parser.parse_args()
+
+    user_input = []
+    if args.input is None:
+        user_input.append(input("Please enter the name of input file:\n"))
+    else:
+        user_input.append(args.input)
+
+    if args.option is None:
+        val = 0
+        while not val or val > 3:
+             val = int(input("Select:\n 1: Sum of Manhattan distances\n 2: Sum of Manhattan distances + 2 x # linear conflicts\n 3: Additive pattern database (boards up to 4x4)\n"))
+        print()
+        user_input.append(val)
+    else:
+        user_input.append(args.option)
+
+    user_input.append(args.mode)
+    user_input += [args.weight, args.time_limit, args.max_nodes, args.workers]
+
+    stats = None
+    if args.stats or args.progress:
+        progress = None
+        if args.progress:
+            progress = lambda stats: print(stats.to_json(), file=sys.stderr, flush=True)
+        stats = SearchStats(progress, args.progress or 10000)
+
+    cache = None
+    if args.cache:
+        cache = SolutionCache(args.cache)
+    output = main(user_input, stats, cache = cache)
+    if args.stats:
+        print(stats.to_json(), file=sys.stderr)
+        if cache is not None:
+            print(json.dumps(cache.stats()), file=sys.stderr)
+
+    # Given name of the input file, create the correct filename of output file
+    filename = user_input[0].split(".")
+    if "input" in filename[0].lower():
+        num = filename[0].lower().split("input")[1]
+        letter = "ABC"[user_input[1] - 1]
+        filename[0] = "Output" + num + "_" + letter
+        # Other search modes get their own output file
+        if user_input[2] != "astar":
+            filename[0] += "_" + user_input[2]
+
+    open(".".join(filename), "w").write(output)
@@ -0,0 +1,93 @@
+# Solves many number shifter puzzles at once across a pool of processes
+# Results are printed as JSON lines as soon as each puzzle is solved (not in input order)
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+from app import parse, solve, solution_path
+
+# Yields (id, initial state, goal state) for each puzzle in a JSON lines stream
+# Each line looks like {"id": "a", "start": [[1, 2, 3], ...], "goal": [[1, 2, 3], ...]}, id defaults to the line number
+def read_jsonl(lines):
+    for i, line in enumerate(lines):
+        if line.strip():
+            puzzle = json.loads(line)
+            yield puzzle.get("id", i + 1), puzzle["start"], puzzle["goal"]
+
+# Yields (id, initial state, goal state) for each puzzle in the source, one at a time
+# Source is a directory (every input file in it), a JSON lines file, - for JSON lines from stdin, or a glob of input files
+def read_puzzles(source):
+    if source == "-":
+        yield from read_jsonl(sys.stdin)
+    elif os.path.isdir(source):
+        for entry in os.scandir(source):
+            # Same naming as the single file mode, so output files in the same folder are skipped
+            if entry.is_file() and "input" in entry.name.lower():
+                yield (entry.path,) + parse(entry.path)
+    elif source.endswith(".jsonl"):
+        with open(source, "r") as f:
+            yield from read_jsonl(f)
+    else:
+        for path in glob.iglob(source):
+            yield (path,) + parse(path)
+
+# Solves a single puzzle in a worker process and returns its result
+# limits are the weight, time limit and node limit of the weighted and anytime modes
+def solve_puzzle(puzzle, option, mode, limits):
+    id, init_state, goal_state = puzzle
+    start = time.perf_counter()
+    try:
+        solved, goal_node = solve(init_state, goal_state, option, mode, *limits)
+    except ValueError as e:
+        return {"id": id, "error": str(e)}
+    result = {"id": id, "depth": None, "nodes": solved.nodes_gen, "moves": None}
+    if goal_node is not None:
+        moves, costs = solution_path(goal_node)
+        result["depth"] = goal_node.depth
+        result["moves"] = " ".join(moves)
+    if mode == "weighted" or mode == "anytime":
+        result["stopped"] = solved.stopped
+        result["bound"] = solved.bound
+    result["seconds"] = round(time.perf_counter() - start, 6)
+    return result
+
+# Solves every puzzle across the pool and yields the results as they finish
+# Only a few puzzles per worker are handed out at a time, so memory stays the same no matter how many puzzles there are
+def solve_all(puzzles, option, mode, workers = None, limits = (), pending_per_worker = 4):
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(workers) as pool:
+        pending = set()
+        for puzzle in puzzles:
+            pending.add(pool.submit(solve_puzzle, puzzle, option, mode, limits))
+            if len(pending) >= workers * pending_per_worker:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solves many number shifter puzzles across a pool of processes")
+    parser.add_argument("source", help="directory of input files, glob of input files, JSON lines file, or - for JSON lines from stdin")
+    parser.add_argument("option", nargs="?", type=int, choices=[1, 2, 3], default=2, help="heuristic option, same as app.py (default 2)")
+    parser.add_argument("--mode", choices=["astar", "ida", "table", "bidir", "weighted", "anytime"], default="astar", help="search mode, same as app.py (default astar)")
+    parser.add_argument("--weight", type=float, default=2, help="weight of h(n) for weighted and anytime (default 2)")
+    parser.add_argument("--time-limit", type=float, default=None, help="seconds weighted and anytime can search for, per puzzle")
+    parser.add_argument("--max-nodes", type=int, default=None, help="nodes weighted and anytime can generate, per puzzle")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: number of CPUs)")
+    args = parser.parse_args()
+
+    solved = 0
+    start = time.perf_counter()
+    limits = (args.weight, args.time_limit, args.max_nodes)
+    for result in solve_all(read_puzzles(args.source), args.option, args.mode, args.workers, limits):
+        print(json.dumps(result), flush=True)
+        solved += 1
+    elapsed = time.perf_counter() - start
+    print("Solved %d puzzles in %.2f seconds" % (solved, elapsed), file=sys.stderr)
@@ -0,0 +1,253 @@
+# Benchmarks the number shifter solvers on seeded, generated puzzles and compares the results with a stored baseline
+# Exits with 1 if any search got slower than the baseline by more than --max-slowdown, or a search that finds a shortest
+# solution (see exact_search in app.py) found one of a different length than in the baseline
+# ex: python benchmark.py                      (run and compare with benchmark_baseline.json)
+#     python benchmark.py --update-baseline    (run and save the results as the new baseline)
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from app import Puzzle, SearchStats, exact_search, unpack_state, move_tile, solve, solvable
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+# Puzzles to generate: (name, size, kind, optimal depth, how many)
+# walk puzzles are random walks from the goal and random puzzles are random solvable boards,
+# both kept only if their shortest solution is exactly depth moves
+# Random 4x4 boards are about 45 to 60 moves from the goal, so their depth is the lowest one that comes up often
+SUITE = [
+    ("3x3-walk-14", 3, "walk", 14, 2),
+    ("3x3-walk-20", 3, "walk", 20, 2),
+    ("3x3-walk-26", 3, "walk", 26, 2),
+    ("3x3-random-20", 3, "random", 20, 2),
+    ("3x3-random-24", 3, "random", 24, 2),
+    ("4x4-walk-20", 4, "walk", 20, 2),
+    ("4x4-walk-30", 4, "walk", 30, 2),
+    ("4x4-random-46", 4, "random", 46, 2),
+]
+
+# Searches to time on every puzzle: (name, heuristic option, mode)
+SEARCHES = [
+    ("astar-1", 1, "astar"),
+    ("astar-2", 2, "astar"),
+    ("astar-3", 3, "astar"),
+    ("ida-2", 2, "ida"),
+    ("ida-3", 3, "ida"),
+    ("bidir-3", 3, "bidir"),
+    ("weighted-2", 2, "weighted"),
+    ("anytime-1", 1, "anytime"),
+    ("table", 1, "table"),
+]
+
+class BenchmarkTimeout(Exception):
+    pass
+
+# Goal state of the given size, 1, 2, 3, ... with the blank space last
+def standard_goal(size):
+    return [[(r * size + c + 1) % (size * size) for c in range(size)] for r in range(size)]
+
+# Random walk of the blank space from the goal that never undoes the last move
+def random_walk(size, moves, rng):
+    puzzle = Puzzle(standard_goal(size), standard_goal(size))
+    state, blank, previous = puzzle.state, puzzle.blank, None
+    for i in range(moves):
+        target = rng.choice([target for move, target in puzzle.moves[blank] if target != previous])
+        state = move_tile(state, blank, target, puzzle.bits)[0]
+        previous, blank = blank, target
+    return unpack_state(state, size)
+
+# Random solvable board, swapping two numbers if the shuffled board can't reach the goal
+def random_board(size, rng):
+    nums = list(range(size * size))
+    rng.shuffle(nums)
+    board = [nums[r * size:(r + 1) * size] for r in range(size)]
+    if not solvable(board, standard_goal(size)):
+        i, j = [k for k in range(size * size) if nums[k] != 0][:2]
+        board[i // size][i % size], board[j // size][j % size] = board[j // size][j % size], board[i // size][i % size]
+    return board
+
+# Shortest solution length, with the exact table on 3x3 boards and A* with the pattern databases on 4x4 boards
+# Shortest solution length, or None if it is more than limit moves
+# With the exact table on 3x3 boards, and IDA* with the pattern databases on 4x4 boards, stopped once the threshold
+# goes over limit (finishing the search on the boards that are too deep could take minutes)
+def optimal_depth(board, size, limit):
+    if size == 3:
+        depth = solve(board, standard_goal(size), 1, "table")[1].depth
+        return depth if depth <= limit else None
+    puzzle = Puzzle(board, standard_goal(size))
+    puzzle.ida_state, puzzle.ida_blank = puzzle.state, puzzle.blank
+    h = puzzle.heuristic(puzzle.state, 3)
+    pattern = puzzle.pattern_index(puzzle.state, 3)
+    threshold = h
+    while threshold <= limit:
+        result = puzzle.bounded_search(0, h, threshold, None, [], 3, pattern)
+        if result is True:
+            return threshold
+        threshold = result
+    return None
+
+# Generates the puzzles of the suite, always the same ones for the same seed
+# Returns (name, board, goal, optimal depth) for each
+def generate(seed):
+    rng = random.Random(seed)
+    puzzles = []
+    for name, size, kind, depth, count in SUITE:
+        for i in range(count):
+            while True:
+                if kind == "random":
+                    board = random_board(size, rng)
+                else:
+                    board = random_walk(size, rng.randint(depth, 2 * depth), rng)
+                if optimal_depth(board, size, depth) == depth:
+                    break
+            puzzles.append(("%s-%d" % (name, i + 1), board, standard_goal(len(board)), depth))
+    return puzzles
+
+# Solves the puzzle once with a SearchStats checking the time, giving up after timeout seconds
+# Raises ValueError if the search says its solution is a shortest one (see exact_search in app.py, or a bound of 1)
+# but it is not optimal moves long
+# Returns the nodes generated and depth of the solution
+def count(board, goal, option, mode, timeout, optimal):
+    start = time.perf_counter()
+
+    def check(stats):
+        if time.perf_counter() - start > timeout:
+            raise BenchmarkTimeout()
+
+    puzzle, node = solve(board, goal, option, mode, stats = SearchStats(check, 1000))
+    if (exact_search(mode, option) or (mode in ["weighted", "anytime"] and puzzle.bound == 1)) and node.depth != optimal:
+        raise ValueError("wrong answer: %s found %d moves, the shortest solution is %d" % (mode, node.depth, optimal))
+    return puzzle.nodes_gen, node.depth
+
+# Solves the puzzle once without stats, the same way app.py does, and returns the seconds taken
+# There is no timeout, so it is only run once count has finished in time
+def run(board, goal, option, mode):
+    start = time.perf_counter()
+    solve(board, goal, option, mode)
+    return time.perf_counter() - start
+
+# Runs every search on every puzzle, yielding a result for each
+def benchmark(puzzles, searches, repeat, timeout, memory):
+    for name, board, goal, optimal in puzzles:
+        for search, option, mode in searches:
+            # The exact table only exists for 3x3 boards
+            if mode == "table" and len(board) > 3:
+                continue
+            result = {"case": name + "/" + search, "board": " ".join(str(num) for row in board for num in row)}
+            try:
+                result["nodes"], result["depth"] = count(board, goal, option, mode, timeout, optimal)
+                result["seconds"] = min(run(board, goal, option, mode) for i in range(repeat))
+                if memory:
+                    tracemalloc.start()
+                    run(board, goal, option, mode)
+                    result["peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+                    tracemalloc.stop()
+            except BenchmarkTimeout:
+                tracemalloc.stop()
+                result["timeout"] = True
+            yield result
+
+# Solves every puzzle with the pida mode and the pattern databases on 1 to max_workers processes,
+# yielding (case, workers, seconds, depth) for each. seconds is the fastest of repeat runs, and includes starting the pool
+def scaling(puzzles, max_workers, repeat):
+    for name, board, goal, optimal in puzzles:
+        for workers in range(1, max_workers + 1):
+            times = []
+            for i in range(repeat):
+                start = time.perf_counter()
+                puzzle, node = solve(board, goal, 3, "pida", workers = workers)
+                times.append(time.perf_counter() - start)
+            yield name, workers, min(times), node.depth
+
+# Compares a result with its baseline, returning how many times slower it is (None if it can't be compared)
+# and whether it counts as a slowdown
+def compare(result, baseline, max_slowdown, min_seconds):
+    if baseline is None:
+        return None, False
+    if result.get("timeout"):
+        return None, not baseline.get("timeout")
+    if baseline.get("timeout"):
+        return None, False
+    ratio = result["seconds"] / baseline["seconds"] if baseline["seconds"] else None
+    # Very short searches are mostly noise
+    slower = ratio is not None and baseline["seconds"] >= min_seconds and ratio > 1 + max_slowdown
+    return ratio, slower
+
+# Compares the solution of a result with its baseline, returning whether the depth is wrong (a search that finds a
+# shortest solution found one of a different length) and a note on the change in nodes generated ("" if none)
+def compare_solution(result, baseline, option, mode):
+    if baseline is None or result.get("timeout") or baseline.get("timeout"):
+        return False, ""
+    wrong = exact_search(mode, option) and result["depth"] != baseline["depth"]
+    note = ""
+    if result["nodes"] != baseline["nodes"]:
+        note = "  nodes %+.1f%%" % ((result["nodes"] - baseline["nodes"]) * 100 / baseline["nodes"])
+    if wrong:
+        note += "  DEPTH WAS %d" % baseline["depth"]
+    return wrong, note
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the number shifter solvers on generated puzzles")
+    parser.add_argument("--seed", type=int, default=2022, help="seed of the puzzle generator (default 2022)")
+    parser.add_argument("--search", action="append", help="only run these searches (can be given more than once)")
+    parser.add_argument("--repeat", type=int, default=3, help="times to run each search, the fastest is kept (default 3)")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds before a search is given up on (default 30)")
+    parser.add_argument("--no-memory", action="store_true", help="don't measure peak memory (it needs an extra run)")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline file (default benchmark_baseline.json)")
+    parser.add_argument("--max-slowdown", type=float, default=0.25, help="fraction slower than the baseline that fails the run (default 0.25)")
+    parser.add_argument("--min-seconds", type=float, default=0.01, help="searches faster than this in the baseline are not compared (default 0.01)")
+    parser.add_argument("--update-baseline", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--scaling", type=int, default=None, metavar="N", help="instead, time the pida mode on the 4x4 puzzles with 1 to N processes")
+    args = parser.parse_args()
+
+    searches = [search for search in SEARCHES if args.search is None or search[0] in args.search]
+    baselines = dict()
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, "r") as f:
+            baselines = json.load(f)
+
+    print("Generating puzzles...", file=sys.stderr)
+    puzzles = generate(args.seed)
+    if args.scaling:
+        print("%-28s %8s %10s %8s %6s" % ("case", "workers", "seconds", "speedup", "depth"))
+        for case, workers, seconds, depth in scaling([puzzle for puzzle in puzzles if len(puzzle[1]) == 4], args.scaling, args.repeat):
+            if workers == 1:
+                single = seconds
+            print("%-28s %8d %10.4f %7.2fx %6d" % (case, workers, seconds, single / seconds, depth), flush=True)
+        sys.exit(0)
+    results = dict()
+    slowdowns = 0
+    wrong_depths = 0
+    options = {name: (option, mode) for name, option, mode in SEARCHES}
+    print("%-28s %10s %10s %6s %10s %10s" % ("case", "seconds", "nodes", "depth", "peak kb", "vs base"))
+    for result in benchmark(puzzles, searches, args.repeat, args.timeout, not args.no_memory):
+        case = result.pop("case")
+        results[case] = result
+        ratio, slower = compare(result, baselines.get(case), args.max_slowdown, args.min_seconds)
+        wrong, note = compare_solution(result, baselines.get(case), *options[case.split("/")[1]])
+        slowdowns += slower
+        wrong_depths += wrong
+        if result.get("timeout"):
+            print("%-28s %10s" % (case, "timeout") + ("  SLOWER" if slower else ""), flush=True)
+        else:
+            print("%-28s %10.4f %10d %6d %10s %10s" % (case, result["seconds"], result["nodes"], result["depth"], result.get("peak_kb", "-"),
+                  "-" if ratio is None else "%.2fx" % ratio) + ("  SLOWER" if slower else "") + note, flush=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=1)
+        print("Saved baseline to " + args.baseline, file=sys.stderr)
+    if slowdowns:
+        print("%d searches were more than %g%% slower than the baseline" % (slowdowns, args.max_slowdown * 100), file=sys.stderr)
+    if wrong_depths:
+        print("%d searches that find a shortest solution found one of a different length than the baseline" % wrong_depths, file=sys.stderr)
+    if slowdowns or wrong_depths:
+        sys.exit(1)
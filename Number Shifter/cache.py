@@ -0,0 +1,95 @@
+# Cache of solutions, kept in memory and optionally in a sqlite file so they last between runs
+# Keys are strings and values anything JSON can hold. Both levels drop the least recently used entries once they are full
+# ex: cache = SolutionCache("solutions.db")
+#     hit, value = cache.get(key)
+#     if not hit:
+#         value = ...
+#         cache.put(key, value)
+from collections import OrderedDict
+import json
+import sqlite3
+import threading
+import time
+
+class SolutionCache:
+    # path is the sqlite file, or None to only keep entries in memory
+    # max_entries is the most entries kept in memory, max_disk_entries the most kept in the file
+    def __init__(self, path = None, max_entries = 10000, max_disk_entries = 1000000):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        # Most recently used last
+        self.entries = OrderedDict()
+        # Threads of the service share the cache
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.db = None
+        if path is not None:
+            # Other processes can have the same file open, so wait for their writes instead of failing
+            self.db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, value TEXT NOT NULL, used REAL NOT NULL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS solutions_used ON solutions (used)")
+            self.disk_entries = self.db.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+    # Returns (True, value) if the key is in the cache, otherwise (False, None)
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, self.entries[key]
+            if self.db is not None:
+                row = self.db.execute("SELECT value FROM solutions WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self.db.execute("UPDATE solutions SET used = ? WHERE key = ?", (time.time(), key))
+                    value = json.loads(row[0])
+                    self.remember(key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return True, value
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        with self.lock:
+            self.remember(key, value)
+            if self.db is not None:
+                inserted = self.db.execute("INSERT OR IGNORE INTO solutions VALUES (?, ?, ?)", (key, json.dumps(value), time.time())).rowcount
+                self.disk_entries += inserted
+                if self.disk_entries > self.max_disk_entries:
+                    # Other processes may have added entries too, so count again before dropping the oldest
+                    self.disk_entries = self.db.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+                    extra = self.disk_entries - self.max_disk_entries
+                    if extra > 0:
+                        self.db.execute("DELETE FROM solutions WHERE key IN (SELECT key FROM solutions ORDER BY used LIMIT ?)", (extra,))
+                        self.disk_entries -= extra
+                        self.evictions += extra
+
+    # Adds the entry to memory, dropping the least recently used one if it is full
+    def remember(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "disk_entries": None if self.db is None else self.disk_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+            }
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
@@ -0,0 +1,105 @@
+# Sends puzzles to a running service.py from many clients at once and reports the latency of the requests
+# Each client keeps its own connection open and sends its next request as soon as the last one is answered
+# ex: python service.py &
+#     python loadtest.py --clients 16 --requests 2000
+import argparse
+import http.client
+import itertools
+import json
+import math
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from batch import read_jsonl
+from benchmark import random_walk, standard_goal
+
+# Request bodies for count seeded random walks of the given number of moves from the goal of the given size
+# With distinct, only that many different puzzles are made and they are sent over and over
+def generated_bodies(seed, count, size, moves, option, mode, distinct = None):
+    rng = random.Random(seed)
+    bodies = [json.dumps({"start": random_walk(size, moves, rng), "goal": standard_goal(size), "option": option, "mode": mode})
+              for i in range(min(count, distinct or count))]
+    return list(itertools.islice(itertools.cycle(bodies), count))
+
+# Request bodies for the puzzles of a JSON lines file (see batch.py), repeated until there are count of them
+def file_bodies(filename, count, option, mode):
+    with open(filename, "r") as f:
+        puzzles = list(read_jsonl(f))
+    return [json.dumps({"start": start, "goal": goal, "option": option, "mode": mode}) for id, start, goal in itertools.islice(itertools.cycle(puzzles), count)]
+
+# Nearest rank percentile of the sorted latencies
+def percentile(latencies, p):
+    return latencies[max(0, math.ceil(p / 100 * len(latencies)) - 1)]
+
+# Sends every body to the service from clients threads at once
+# Returns the seconds each request took (sorted), the number of requests that failed, and the seconds the whole run took
+def run(url, bodies, clients):
+    parts = urlsplit(url)
+    bodies = iter(bodies)
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def client():
+        nonlocal errors
+        connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+        while True:
+            with lock:
+                body = next(bodies, None)
+            if body is None:
+                break
+            start = time.perf_counter()
+            try:
+                connection.request("POST", "/solve", body, {"Content-Type": "application/json"})
+                response = connection.getresponse()
+                response.read()
+                failed = response.status != 200
+            except (OSError, http.client.HTTPException):
+                # Start over with a new connection
+                connection.close()
+                failed = True
+            seconds = time.perf_counter() - start
+            with lock:
+                latencies.append(seconds)
+                errors += failed
+        connection.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), errors, time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load tests a running number shifter service and reports the latency percentiles")
+    parser.add_argument("--url", default="http://127.0.0.1:8080", help="address of the service (default http://127.0.0.1:8080)")
+    parser.add_argument("--clients", type=int, default=8, help="clients sending requests at the same time (default 8)")
+    parser.add_argument("--requests", type=int, default=1000, help="total requests to send (default 1000)")
+    parser.add_argument("--puzzles", help="JSON lines file of puzzles to send (see batch.py), instead of generated ones")
+    parser.add_argument("--size", type=int, default=3, help="length of a row of the generated puzzles (default 3)")
+    parser.add_argument("--moves", type=int, default=30, help="moves of the random walk making each generated puzzle (default 30)")
+    parser.add_argument("--option", type=int, choices=[1, 2, 3], default=2, help="heuristic option the service solves with (default 2)")
+    parser.add_argument("--mode", default="astar", help="search mode the service solves with (default astar)")
+    parser.add_argument("--distinct", type=int, default=None, help="only generate this many different puzzles and repeat them, to test the cache (only used with option 1 or 3)")
+    parser.add_argument("--seed", type=int, default=2022, help="seed of the puzzle generator (default 2022)")
+    args = parser.parse_args()
+
+    if args.puzzles:
+        bodies = file_bodies(args.puzzles, args.requests, args.option, args.mode)
+    else:
+        bodies = generated_bodies(args.seed, args.requests, args.size, args.moves, args.option, args.mode, args.distinct)
+    latencies, errors, seconds = run(args.url, bodies, args.clients)
+    if not latencies:
+        print("No requests were sent", file=sys.stderr)
+        sys.exit(1)
+    print("requests   %d (%d failed) from %d clients in %.2f seconds, %.1f requests/s" % (len(latencies), errors, args.clients, seconds, len(latencies) / seconds))
+    for p in [50, 90, 99]:
+        print("p%-9d %.2f ms" % (p, percentile(latencies, p) * 1000))
+    print("max        %.2f ms" % (latencies[-1] * 1000))
+    if errors:
+        sys.exit(1)
@@ -0,0 +1,173 @@
+# Keeps the number shifter solver running as a local HTTP service, so puzzles are solved without starting Python every time
+# and the pattern databases and exact distance table stay open between requests
+# POST /solve with a JSON body {"start": [[1, 2, 3], ...], "goal": [[1, 2, 3], ...]} and optionally "option", "mode",
+# "weight", "time_limit" and "max_nodes" (same as batch.py). Answers with the same result as batch.py,
+# {"depth": ..., "nodes": ..., "moves": "U L ...", "seconds": ...}, or {"error": ...} with status 400 if the request is not valid
+# Shortest solutions are cached by the puzzle with its tiles relabeled (see puzzle_key in app.py), "cached" tells if it was a hit
+# GET /health answers {"status": "ok"}, GET /stats answers the hit rate and size of the cache
+# ex: python service.py --port 8080
+#     curl -d '{"start": [[1, 2, 3], [4, 0, 6], [7, 5, 8]], "goal": [[1, 2, 3], [4, 5, 6], [7, 8, 0]]}' http://127.0.0.1:8080/solve
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import os
+import sys
+import time
+
+from app import Puzzle, exact_search, load_distance_table, puzzle_key
+from batch import solve_puzzle
+from cache import SolutionCache
+
+# Search modes the service can run, pida is left out since it starts its own processes
+MODES = ["astar", "ida", "table", "bidir", "weighted", "anytime"]
+
+# Opens the tables of the goals with the blank space last in this process, building them first if they were never built
+def warm():
+    for size in [3, 4]:
+        goal = [[(r * size + c + 1) % (size * size) for c in range(size)] for r in range(size)]
+        Puzzle(goal, goal).load_pattern_databases()
+    load_distance_table(3, 8)
+
+# Checks a board of a request is a square list of rows holding each number from 0 to size x size - 1 once, returns it
+def check_board(board, name):
+    if not isinstance(board, list) or not board or not all(isinstance(row, list) and len(row) == len(board) for row in board):
+        raise ValueError(name + " must be a square list of rows")
+    nums = [num for row in board for num in row]
+    if not all(isinstance(num, int) for num in nums) or sorted(nums) != list(range(len(nums))):
+        raise ValueError("%s must hold each number from 0 to %d once" % (name, len(nums) - 1))
+    return board
+
+# Checks a request and returns its initial state, goal state, option, mode and limits (weight, time limit and node limit)
+# Raises ValueError if the request is not valid
+def check_request(request):
+    start = check_board(request.get("start"), "start")
+    goal = check_board(request.get("goal"), "goal")
+    if len(start) != len(goal):
+        raise ValueError("start and goal must be the same size")
+    option = request.get("option", 2)
+    if option not in [1, 2, 3]:
+        raise ValueError("option must be 1, 2 or 3")
+    mode = request.get("mode", "astar")
+    if mode not in MODES:
+        raise ValueError("mode must be one of " + ", ".join(MODES))
+    limits = (request.get("weight", 2), request.get("time_limit"), request.get("max_nodes"))
+    if not all(limit is None or isinstance(limit, (int, float)) for limit in limits):
+        raise ValueError("weight, time_limit and max_nodes must be numbers")
+    return start, goal, option, mode, limits
+
+# Solves the puzzle of a request and returns the response
+# Raises ValueError if the puzzle can't be solved with the option or mode
+def solve_request(start, goal, option, mode, limits):
+    result = solve_puzzle((None, start, goal), option, mode, limits)
+    del result["id"]
+    if "error" in result:
+        raise ValueError(result["error"])
+    return result
+
+class SolveHandler(BaseHTTPRequestHandler):
+    # Keeps connections open, so a client can send many requests without connecting again
+    protocol_version = "HTTP/1.1"
+    # The headers and the body are written separately, which would otherwise wait on the client's delayed ACK
+    disable_nagle_algorithm = True
+    # Process pool the puzzles are solved in, or None to solve them in the thread of the request (set by serve)
+    pool = None
+    # SolutionCache shared by every request, or None (set by serve)
+    cache = None
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.reply(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self.reply(200, {"cache": None if self.cache is None else self.cache.stats()})
+        else:
+            self.reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path != "/solve":
+            self.reply(404, {"error": "not found"})
+            return
+        try:
+            request = json.loads(body)
+            if not isinstance(request, dict):
+                raise ValueError("expected a JSON object")
+            response = self.answer(*check_request(request))
+        except ValueError as e:
+            self.reply(400, {"error": str(e)})
+            return
+        except Exception as e:
+            self.reply(500, {"error": "%s: %s" % (type(e).__name__, e)})
+            return
+        self.reply(200, response)
+
+    # Runs solve_request in the pool, or in this thread if there is none
+    def run(self, *puzzle):
+        if self.pool is None:
+            return solve_request(*puzzle)
+        return self.pool.submit(solve_request, *puzzle).result()
+
+    # The cache is looked up in this thread, so hits never wait for the pool
+    # Only searches that find a shortest solution are cached, the others depend on their option or limits
+    def answer(self, start, goal, option, mode, limits):
+        if self.cache is None or not exact_search(mode, option):
+            return self.run(start, goal, option, mode, limits)
+        begin = time.perf_counter()
+        key = puzzle_key(start, goal)
+        hit, moves = self.cache.get(key)
+        if hit:
+            return {"depth": len(moves), "nodes": 0, "moves": " ".join(moves), "cached": True, "seconds": round(time.perf_counter() - begin, 6)}
+        result = self.run(start, goal, option, mode, limits)
+        # Puzzles without a solution are not cached, solvable() answers them right away
+        if result["depth"] is not None:
+            self.cache.put(key, result["moves"].split())
+        result["cached"] = False
+        return result
+
+    # Requests are not logged one by one
+    def log_message(self, format, *args):
+        pass
+
+# Serves requests until interrupted, each connection gets its own thread
+# With workers, the puzzles are solved in that many processes so they run in parallel (the tables are memory mapped,
+# so the processes share them), otherwise they are solved in the threads of the requests, which only uses one CPU
+# cache is the SolutionCache to answer repeated puzzles from, or None to solve every one
+def serve(host, port, workers = None, cache = None):
+    warm()
+    SolveHandler.cache = cache
+    if workers:
+        SolveHandler.pool = ProcessPoolExecutor(workers, initializer=warm)
+    server = ThreadingHTTPServer((host, port), SolveHandler)
+    print("Serving on http://%s:%d" % server.server_address[:2], file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if SolveHandler.pool is not None:
+            SolveHandler.pool.shutdown(cancel_futures=True)
+        if cache is not None:
+            cache.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves the number shifter solver over local HTTP")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default 127.0.0.1, only this machine)")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on (default 8080)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes to solve in, 0 to solve in the request threads (default: number of CPUs)")
+    parser.add_argument("--cache", metavar="FILE", help="sqlite file to also keep the cached solutions in, so they last between runs")
+    parser.add_argument("--cache-size", type=int, default=10000, help="solutions kept in memory, 0 to turn the cache off (default 10000)")
+    parser.add_argument("--cache-disk-size", type=int, default=1000000, help="solutions kept in the --cache file (default 1000000)")
+    args = parser.parse_args()
+    cache = None
+    if args.cache_size > 0:
+        cache = SolutionCache(args.cache, args.cache_size, args.cache_disk_size)
+    serve(args.host, args.port, args.workers, cache)
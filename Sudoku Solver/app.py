@@ -1,283 +1,915 @@
 # Yikai Wang
-from copy import deepcopy
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import os
 import sys
+import time
+
+from cache import SolutionCache
 
 # Given filename, opens the file and returns cells of the puzzle
 def parse(input):
     cells = []
-    i = 0
     with open(input, "r") as f:
         for line in f.readlines():
-            # Gets the first 9 lines
-            if i < 9:
+            if line.split():
                 cells.append([ int(i) for i in line.split() ])
-                i += 1
-    return cells
-
-# A cell contains the number, the row and column number, block number, and most importantly the domain
-class Cell:
-    def __init__(self, num, row, col, blocknum):
-        self.num = num
-        self.row = row
-        self.col = col
-        self.block = blocknum
-        self.domain = [ i for i in range(1, 9 + 1) ] if num == 0 else [ num ]
+    # The board is square, so the length of the first row gives the number of rows (9, 16, 25, ...)
+    return cells[:len(cells[0])]
+
+# Side of the blocks of a size x size board, which must be a square number
+def box_size(size):
+    box = math.isqrt(size)
+    if size == 0 or box * box != size:
+        raise ValueError("The board must be 4x4, 9x9, 16x16, 25x25, ... but it has %d rows" % size)
+    return box
+
+# Tables of each board size already built by this process
+board_tables = dict()
+
+# Peer and unit tables of a size x size board, built once for each size
+# Cells are numbered by row, index = row * size + col
+# peers[ i ] holds the indices of the cells that share a row, column or block with cell i (20 on a 9x9 board)
+# units holds the rows, then the columns, then the blocks as tuples of cell indices, every number appears once in each unit
+def load_board_tables(size):
+    if size not in board_tables:
+        box = box_size(size)
+        units = [tuple(r * size + c for c in range(size)) for r in range(size)]
+        units += [tuple(r * size + c for r in range(size)) for c in range(size)]
+        units += [tuple(r * size + c for r in range(br, br + box) for c in range(bc, bc + box)) for br in range(0, size, box) for bc in range(0, size, box)]
+        peers = []
+        for i in range(size * size):
+            row, col = i // size, i % size
+            cells = set(units[row] + units[size + col] + units[2 * size + row // box * box + col // box])
+            cells.discard(i)
+            peers.append(tuple(sorted(cells)))
+        board_tables[size] = (peers, units)
+    return board_tables[size]
+
+# String representation of a puzzle given as a list of rows
+def grid_string(grid):
+    list_s = []
+    for row in grid:
+        s_row = []
+        for num in row:
+            s_row.append(str(num))
+        list_s.append(" ".join(s_row) + "\n")
+    return "".join(list_s)
+
+# Propagation rules the search can run after every assignment, in the order they are tried (see Sudoku.propagate)
+RULES = ["naked_singles", "hidden_singles", "ac3", "naked_pairs", "hidden_pairs", "pointing_pairs"]
+
+# Collects what the backtracking search is doing, to find where the time goes without a profiler
+# The search only collects stats when one is given to the Sudoku (sudoku.stats), so it costs nothing by default
+# progress(stats) is called every progress_every nodes (calls to backtrack)
+class SolverStats:
+    def __init__(self, progress = None, progress_every = 10000):
+        self.nodes = 0
+        self.backtracks = 0
+        self.max_depth = 0
+        self.forward_check_prunings = 0
+        self.propagation_prunings = 0
+        self.wipeouts = 0
+        self.mrv_time = 0.0
+        self.progress = progress
+        self.progress_every = progress_every
+        self.start = time.perf_counter()
+        self.end = None
+
+    # Called on every call to backtrack, depth is the number of cells assigned by the search so far
+    def visit(self, depth):
+        self.nodes += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if self.progress is not None and self.nodes % self.progress_every == 0:
+            self.progress(self)
+
+    # Called once the search is done
+    def finish(self):
+        self.end = time.perf_counter()
+
+    def to_dict(self):
+        elapsed = (self.end or time.perf_counter()) - self.start
+        return {
+            "nodes": self.nodes,
+            "nodes_per_second": self.nodes / elapsed if elapsed else 0,
+            "backtracks": self.backtracks,
+            "max_depth": self.max_depth,
+            "forward_check_prunings": self.forward_check_prunings,
+            "propagation_prunings": self.propagation_prunings,
+            "wipeouts": self.wipeouts,
+            "mrv_seconds": self.mrv_time,
+            "seconds": elapsed,
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
 
 class Sudoku:
-    def __init__(self, cells):
+    # rules are the names of the propagation rules (see RULES) to run after every assignment
+    def __init__(self, cells, rules = (), stats = None):
         self.failure = False
 
-        # Sudoku contains a list of cells
-        self.cells = []
+        # SolverStats to fill in, if any
+        self.stats = stats
 
-        # Cells that are yet to have a number assigned to them
-        self.unassigned = []
+        # Propagation rules to run, as methods
+        for rule in rules:
+            if rule not in RULES:
+                raise ValueError("Unknown propagation rule: " + rule)
+        self.rules = [getattr(self, rule) for rule in RULES if rule in rules]
 
-        # Cells that are given a number at the start (already filled in)
-        self.given = []
+        # Board size and its peer and unit tables (see load_board_tables)
+        self.size = len(cells)
+        self.peers, self.units = load_board_tables(self.size)
+        self.blocks = self.units[2 * self.size:]
 
-        # A dictionary is used for cell blocks so it is easier to obtain all the cells in the block
-        self.blocks = { 1:[], 2:[], 3:[], 4:[], 5:[], 6:[], 7:[], 8:[], 9:[] }
+        # The domain of a cell is a bitmask of the numbers it can still take, bit (num - 1) is set if num is possible
+        self.all_nums = (1 << self.size) - 1
 
-        # Fills the list with cells
-        for r in range(len(cells)):
-            cell_row = []
-            for c in range(len(cells[r])):
-                blocknum = 0
-                # Determine which block the cell belongs
-                if r < 3:
-                    if c < 3:
-                        blocknum = 1
-                    elif c < 6:
-                        blocknum = 2
-                    else:
-                        blocknum = 3
-                elif r < 6:
-                    if c < 3:
-                        blocknum = 4
-                    elif c < 6:
-                        blocknum = 5
-                    else:
-                        blocknum = 6
-                else:
-                    if c < 3:
-                        blocknum = 7
-                    elif c < 6:
-                        blocknum = 8
-                    else:
-                        blocknum = 9
-                # Creates the appropriate cell
-                cell = Cell(cells[r][c], r, c, blocknum)
-                cell_row.append(cell)
-                # If the cell num is 0 initially, then it's unassigned
-                if cell.num == 0:
-                    self.unassigned.append(cell)
-                else:
-                    self.given.append(cell)
-                self.blocks[blocknum].append(cell)
+        # Number in each cell by index, 0 if the cell is yet to have a number assigned to it
+        self.nums = [0] * (self.size * self.size)
+
+        # Domain bitmask of each cell by index
+        self.domains = [self.all_nums] * (self.size * self.size)
+
+        # Numbers of the first solution found (see count_solutions)
+        self.solved_nums = None
 
-            self.cells.append(cell_row)
+        # Every assignment and change to a domain, as pairs of cell index and old domain, so they can be undone exactly
+        self.trail = []
 
-        # Reduces the domain of unassigned in the beginning
-        for i in range(len(self.given)):
-            if not self.forward_check(self.given[i]):
+        # Fills in the cells given a number at the start (already filled in)
+        n = self.size * self.size
+        for r in range(len(cells)):
+            for c in range(len(cells[r])):
+                if cells[r][c] != 0:
+                    if cells[r][c] > self.size:
+                        self.failure = True
+                        return
+                    self.nums[r * self.size + c] = cells[r][c]
+                    self.domains[r * self.size + c] = 1 << (cells[r][c] - 1)
+
+        # Reduces the domains of unassigned cells to the numbers none of their peers were given in the beginning,
+        # this never needs undoing so it is done all at once rather than with forward checking
+        for i in range(n):
+            given = 0
+            for peer in self.peers[i]:
+                if self.nums[peer] != 0:
+                    given |= 1 << (self.nums[peer] - 1)
+            # Two given cells that are peers can't have the same number
+            if self.nums[i] != 0 and self.domains[i] & given:
                 self.failure = True
                 return
+            if self.nums[i] == 0:
+                self.domains[i] &= ~given
+                if self.domains[i] == 0:
+                    self.failure = True
+                    return
+
+        # Number of cells that are yet to have a number assigned to them
+        self.unassigned = self.nums.count(0)
+
+        # Index for picking the next cell (see MRV), kept up to date by every assignment and domain change:
+        # buckets[ k ] is the set of unassigned cells with k numbers left in their domain
+        # and unassigned_peers[ i ] is the number of peers of cell i that are unassigned (its degree)
+        self.buckets = [set() for k in range(self.size + 1)]
+        self.unassigned_peers = [0] * n
+        for i in range(n):
+            if self.nums[i] == 0:
+                self.buckets[self.domains[i].bit_count()].add(i)
+                for peer in self.peers[i]:
+                    self.unassigned_peers[peer] += 1
+
+        # Deduce what can be deduced before searching
+        if not self.propagate():
+            self.failure = True
 
-    # Forward checking algo
-    def forward_check(self, cell):
-        #Row checking
-        for c in range(len(self.cells[cell.row])):
-            if self.cells[cell.row][c] is not cell:
-                # Removes the value from the domain
-                if cell.num in self.cells[cell.row][c].domain:
-                    self.cells[cell.row][c].domain.remove(cell.num)
-                # If the cell does not have any values left in domain, the solution is invalid
-                if len(self.cells[cell.row][c].domain) < 1:
-                    return False
-
-        #Column checking
-        for r in range(len(self.cells)):
-            if self.cells[r][cell.col] is not cell:
-                # Removes the value from the domain
-                if cell.num in self.cells[r][cell.col].domain:
-                    self.cells[r][cell.col].domain.remove(cell.num)
+    # Gives the cell the number, its domain becomes just that number
+    # The assignment goes on the trail with the index stored as -1 - i, so undoing it also unassigns the cell
+    def assign(self, i, num):
+        self.trail.append(-1 - i)
+        self.trail.append(self.domains[i])
+        self.buckets[self.domains[i].bit_count()].remove(i)
+        self.domains[i] = 1 << (num - 1)
+        self.nums[i] = num
+        self.unassigned -= 1
+        unassigned_peers = self.unassigned_peers
+        for peer in self.peers[i]:
+            unassigned_peers[peer] -= 1
+
+    # Forward checking algo: removes the number of cell i from the domains of its peers
+    def forward_check(self, i):
+        nums = self.nums
+        bit = 1 << (nums[i] - 1)
+        domains = self.domains
+        buckets = self.buckets
+        trail = self.trail
+        for peer in self.peers[i]:
+            domain = domains[peer]
+            if domain & bit:
+                trail.append(peer)
+                trail.append(domain)
+                domains[peer] = domain ^ bit
+                if nums[peer] == 0:
+                    length = domain.bit_count()
+                    buckets[length].remove(peer)
+                    buckets[length - 1].add(peer)
+                if self.stats is not None:
+                    self.stats.forward_check_prunings += 1
                 # If the cell does not have any values left in domain, the solution is invalid
-                if len(self.cells[r][cell.col].domain) < 1:
+                if domain == bit:
+                    if self.stats is not None:
+                        self.stats.wipeouts += 1
                     return False
+        return True
 
-        #Block checking
-        for i in range(len(self.blocks[cell.block])):
-            if self.blocks[cell.block][i] is not cell:
-                # Removes the value from the domain
-                if cell.num in self.blocks[cell.block][i].domain:
-                    self.blocks[cell.block][i].domain.remove(cell.num)
-                # If the cell does not have any values left in domain, the solution is invalid
-                if len(self.blocks[cell.block][i].domain) < 1:
-                    return False
+    # Undoes every assignment and domain change made since the trail had mark entries
+    # The trail is undone in reverse, so each entry finds the cells assigned or unassigned just as they were when it was made
+    def undo_assign(self, mark):
+        nums = self.nums
+        domains = self.domains
+        buckets = self.buckets
+        unassigned_peers = self.unassigned_peers
+        trail = self.trail
+        while len(trail) > mark:
+            domain = trail.pop()
+            i = trail.pop()
+            if i < 0:
+                i = -1 - i
+                nums[i] = 0
+                self.unassigned += 1
+                for peer in self.peers[i]:
+                    unassigned_peers[peer] += 1
+                buckets[domain.bit_count()].add(i)
+            elif nums[i] == 0:
+                buckets[domains[i].bit_count()].remove(i)
+                buckets[domain.bit_count()].add(i)
+            domains[i] = domain
+
+    # Removes the numbers in bits from the domain of cell i, returns False if the domain is left empty
+    def remove(self, i, bits):
+        domain = self.domains[i]
+        if domain & bits:
+            self.trail.append(i)
+            self.trail.append(domain)
+            if self.nums[i] == 0:
+                self.buckets[domain.bit_count()].remove(i)
+                self.buckets[(domain & ~bits).bit_count()].add(i)
+            domain &= ~bits
+            self.domains[i] = domain
+            if self.stats is not None:
+                self.stats.propagation_prunings += 1
+            if domain == 0:
+                if self.stats is not None:
+                    self.stats.wipeouts += 1
+                return False
+        return True
 
+    # Runs the propagation rules until none of them can remove anything else
+    # Every rule returns False if it finds the puzzle can't be solved from here
+    # Cheaper rules come first and the rules start over whenever one makes a change, so the expensive ones run only when needed
+    def propagate(self):
+        rules = self.rules
+        k = 0
+        while k < len(rules):
+            changes = len(self.trail)
+            if not rules[k]():
+                return False
+            k = 0 if len(self.trail) != changes else k + 1
         return True
 
-    # Checks if the value is consistent
-    def consistent(self, cell, value):
-        #Row checking
-        for c in range(len(self.cells[cell.row])):
-            # No two cells in the same row can share the same number
-            if self.cells[cell.row][c] is not cell:
-                if value == self.cells[cell.row][c].num:
+    # Naked singles: an unassigned cell with one number left in its domain gets that number
+    def naked_singles(self):
+        nums = self.nums
+        domains = self.domains
+        for i in sorted(self.buckets[1]):
+            # Assigning an earlier single may have emptied the domain of this one
+            if nums[i] == 0 and domains[i]:
+                self.assign(i, domains[i].bit_length())
+                if not self.forward_check(i):
                     return False
+        return True
 
-        #Column checking
-        for r in range(len(self.cells)):
-            # No two cells in the same column can share the same number
-            if self.cells[r][cell.col] is not cell:
-                if value == self.cells[r][cell.col].num:
-                    return False
+    # Hidden singles: a number that fits in only one cell of a row, column or block goes in that cell
+    def hidden_singles(self):
+        nums = self.nums
+        domains = self.domains
+        for unit in self.units:
+            # Numbers in the domain of at least one cell and of at least two cells
+            once = twice = 0
+            for i in unit:
+                twice |= once & domains[i]
+                once |= domains[i]
+            # Some number has no cell left in the unit
+            if once != self.all_nums:
+                return False
+            hidden = once & ~twice
+            if hidden:
+                for i in unit:
+                    bit = domains[i] & hidden
+                    if nums[i] == 0 and bit:
+                        # Two numbers that can each only go in this cell
+                        if bit & (bit - 1):
+                            return False
+                        self.assign(i, bit.bit_length())
+                        if not self.forward_check(i):
+                            return False
+        return True
 
-        #Block checking
-        for i in range(len(self.blocks[cell.block])):
-            # No two cells in the same block can share the same number
-            if self.blocks[cell.block][i] is not cell:
-                if value == self.blocks[cell.block][i].num:
-                    return False
+    # AC-3 arc consistency: with the constraint that peers differ, a number only loses its support in a cell
+    # when a peer's domain is reduced to that number, so the arcs to revise are those towards cells with one number left
+    def ac3(self):
+        nums = self.nums
+        domains = self.domains
+        queue = sorted(self.buckets[1])
+        while queue:
+            i = queue.pop()
+            bit = domains[i]
+            for peer in self.peers[i]:
+                if domains[peer] & bit:
+                    if not self.remove(peer, bit):
+                        return False
+                    if nums[peer] == 0 and (domains[peer] & (domains[peer] - 1)) == 0:
+                        queue.append(peer)
+        return True
 
+    # Naked pairs: two cells of a unit with the same two numbers left take both, so no other cell in the unit can
+    def naked_pairs(self):
+        nums = self.nums
+        domains = self.domains
+        for unit in self.units:
+            pairs = [domains[i] for i in unit if nums[i] == 0 and domains[i].bit_count() == 2]
+            for k in range(len(pairs)):
+                if pairs[k] in pairs[k + 1:]:
+                    for i in unit:
+                        if domains[i] != pairs[k] and not self.remove(i, pairs[k]):
+                            return False
         return True
 
-    def undo_assign(self, cell, value):
-        cell.num = 0
-        self.unassigned.append(cell)
-
-        #Undo edits to row's domain
-        for c in range(len(self.cells[cell.row])):
-            if self.cells[cell.row][c] is not cell:
-                if value not in self.cells[cell.row][c].domain:
-                    self.cells[cell.row][c].domain.append(value)
-
-        #Undo edits to column's domain
-        for r in range(len(self.cells)):
-            if self.cells[r][cell.col] is not cell:
-                if value not in self.cells[r][cell.col].domain:
-                    self.cells[r][cell.col].domain.append(value)
-
-        #Undo edits to block's domain
-        for i in range(len(self.blocks[cell.block])):
-            if self.blocks[cell.block][i] is not cell:
-                if value not in self.blocks[cell.block][i].domain:
-                    self.blocks[cell.block][i].domain.append(value)
-
-    # Degree heuristic function: checks the number of unassigned neighbors
-    def num_unassigned_neighbors(self, cell):
-        num = 0
-        #Tally up num of unassigned neighbors
-        # In the row
-        for c in range(len(self.cells[cell.row])):
-            if self.cells[cell.row][c] is not cell and self.cells[cell.row][c].num == 0:
-                num += 1
-        # In the column
-        for r in range(len(self.cells)):
-            if self.cells[r][cell.col] is not cell and self.cells[r][cell.col].num == 0:
-                num += 1
-        # In the block
-        for i in range(len(self.blocks[cell.block])):
-            # Extra check at the end to see if the row and column is not the same to avoid double counting
-            if self.blocks[cell.block][i] is not cell and self.blocks[cell.block][i].num == 0 and self.blocks[cell.block][i].row != cell.row and self.blocks[cell.block][i].col != cell.col:
-                num += 1
-        return num
+    # Hidden pairs: two numbers that fit in only the same two cells of a unit take those cells,
+    # so both cells lose every other number
+    def hidden_pairs(self):
+        domains = self.domains
+        size = self.size
+        for unit in self.units:
+            # Cells each number fits in, as a bitmask of positions in the unit
+            places = [0] * size
+            for k in range(size):
+                domain = domains[unit[k]]
+                while domain:
+                    bit = domain & -domain
+                    domain ^= bit
+                    places[bit.bit_length() - 1] |= 1 << k
+            for a in range(size):
+                if places[a].bit_count() == 2:
+                    for b in range(a + 1, size):
+                        if places[b] == places[a]:
+                            pair = (1 << a) | (1 << b)
+                            for k in range(size):
+                                if places[a] & (1 << k) and not self.remove(unit[k], self.all_nums & ~pair):
+                                    return False
+        return True
 
+    # Pointing pairs: if a number fits in a block only along one row or column,
+    # no other cell of that row or column outside the block can have it
+    def pointing_pairs(self):
+        nums = self.nums
+        domains = self.domains
+        size = self.size
+        for block in self.blocks:
+            for num in range(1, size + 1):
+                bit = 1 << (num - 1)
+                cells = [i for i in block if nums[i] == 0 and domains[i] & bit]
+                if len(cells) < 2:
+                    continue
+                if all(i // size == cells[0] // size for i in cells):
+                    line = self.units[cells[0] // size]
+                elif all(i % size == cells[0] % size for i in cells):
+                    line = self.units[size + cells[0] % size]
+                else:
+                    continue
+                for i in line:
+                    if i not in block and nums[i] == 0 and not self.remove(i, bit):
+                        return False
+        return True
+
+    # Picks the cell with minimum remaining values from the buckets, breaking ties with the degree heuristic
+    # (the cell with more unassigned neighbors) and then by taking the later cell
     def MRV(self):
-        mrv = self.unassigned[0]
-        domain_length = len(mrv.domain)
-
-        # For all of the variables in the unassigned, check if there is a variable with a smaller domain
-        for i in range(1, len(self.unassigned)):
-            if len(self.unassigned[i].domain) < domain_length:
-                mrv = self.unassigned[i]
-                domain_length = len(mrv.domain)
-            # If there is a tie, use degree heuristic (see which has more unassigned neighbors)
-            elif len(self.unassigned[i].domain) == domain_length:
-                mrv_num_unassigned = self.num_unassigned_neighbors(mrv)
-                other_cell_num_unassigned = self.num_unassigned_neighbors(self.unassigned[i])
-                mrv = mrv if mrv_num_unassigned > other_cell_num_unassigned else self.unassigned[i]
-                domain_length = len(mrv.domain)
-        return mrv
+        unassigned_peers = self.unassigned_peers
+        for bucket in self.buckets:
+            if bucket:
+                if len(bucket) == 1:
+                    return next(iter(bucket))
+                return max(bucket, key=lambda i: (unassigned_peers[i], i))
+        return None
 
     def backtracking_search(self):
+        return self.count_solutions(1) == 1
+
+    # Counts the solutions, stopping as soon as limit of them are found (None to count them all)
+    # The first solution found is kept in solved_nums
+    def count_solutions(self, limit = 2):
+        self.found = 0
+        self.limit = limit
         # If there is a possible solution, find it
         if not self.failure:
-            if self.backtrack():
-                return True
-            self.failure = True
-        return False
+            # Depth of the search is the number of cells assigned since the start
+            self.start_unassigned = self.unassigned
+            self.backtrack()
+            if self.stats is not None:
+                self.stats.finish()
+            if self.found == 0:
+                self.failure = True
+        return self.found
 
+    # Returns True once the search can stop, when limit solutions have been found
     def backtrack(self):
-        # If no variables left to assign, we are done
-        if len(self.unassigned) == 0:
-            return True
+        if self.stats is not None:
+            self.stats.visit(self.start_unassigned - self.unassigned)
+        # If no variables left to assign, we found a solution
+        if self.unassigned == 0:
+            self.found += 1
+            if self.found == 1:
+                self.solved_nums = self.nums[:]
+            return self.found == self.limit
 
         # Pick the cell with minimum remaining values
-        cell = self.MRV()
-        # Create a copy of the domain (actual domain will get modified as we go deeper in the search)
-        domain = deepcopy(cell.domain)
-        # Order from lowest to largest value
-        domain.sort()
-        # See if the values in domain gives solution
-        for value in domain:
-            # If the value is consistent
-            if self.consistent(cell, value):
-                # Assign the cell the value
-                cell.num = value
-                self.unassigned.remove(cell)
-                # Apply forward checking again to detect early failures
-                if self.forward_check(cell):
-                    # Apply backtrack again on next cell
-                    if self.backtrack():
-                        # If successful, return true
-                        return True
-                # Otherwise, unassign the value and undo any edits made to other cell's domain
-                self.undo_assign(cell, value)
-        # Return failure if solution not found
+        if self.stats is None:
+            i = self.MRV()
+        else:
+            start = time.perf_counter()
+            i = self.MRV()
+            self.stats.mrv_time += time.perf_counter() - start
+        # The domain is an int, so it won't change as we go deeper in the search
+        domain = self.domains[i]
+        # Try the values from lowest to largest, every value left in the domain is consistent with the assigned cells
+        while domain:
+            bit = domain & -domain
+            domain ^= bit
+            mark = len(self.trail)
+            # Assign the cell the value
+            self.assign(i, bit.bit_length())
+            # Apply forward checking and the propagation rules again to detect early failures
+            if self.forward_check(i) and self.propagate():
+                # Apply backtrack again on next cell
+                if self.backtrack():
+                    # If enough solutions were found, stop
+                    return True
+            # Otherwise, unassign the value and undo any edits made to other cell's domain
+            self.undo_assign(mark)
+            if self.stats is not None:
+                self.stats.backtracks += 1
+        # Keep searching
         return False
 
+    # Yields the numbers of every subproblem depth levels down the search tree, in the order the search would visit them
+    # Each one is the puzzle with depth more cells filled in, along with whatever the propagation rules deduced from them
+    def split(self, depth):
+        if depth == 0 or self.unassigned == 0:
+            yield self.nums[:]
+            return
+        i = self.MRV()
+        domain = self.domains[i]
+        while domain:
+            bit = domain & -domain
+            domain ^= bit
+            mark = len(self.trail)
+            self.assign(i, bit.bit_length())
+            if self.forward_check(i) and self.propagate():
+                yield from self.split(depth - 1)
+            self.undo_assign(mark)
+
+    # Numbers of the puzzle as a list of rows, the first solution once one is found
+    def grid(self):
+        nums = self.nums if self.solved_nums is None else self.solved_nums
+        return [nums[r * self.size:(r + 1) * self.size] for r in range(self.size)]
+
     # String representation of the puzzle
     def __str__(self):
-        list_s = []
-        for row in self.cells:
-            s_row = []
-            for cell in row:
-                s_row.append(str(cell.num))
-            list_s.append(" ".join(s_row) + "\n")
-        return "".join(list_s)
-
-def main(user_input):
-    sudoku = Sudoku(parse(user_input))
+        return grid_string(self.grid())
+
+# Links of the exact cover matrix of a size x size puzzle, for Algorithm X with dancing links
+# Every way to put a number in a cell is a row (cell * size + num - 1, 729 rows on a 9x9 board)
+# and every rule is a column (324 columns on a 9x9 board): each cell has one number, and each row, column and block has each number once
+# The links are kept in flat lists indexed by node rather than objects, node 0 is the root and the next nodes are the column headers
+# Returns the left, right, up and down links, column header and puzzle row of every node,
+# the number of nodes in each column and the first node of each puzzle row
+def exact_cover_links(size):
+    box = box_size(size)
+    n = size * size
+    columns = 4 * n
+    left = [i - 1 for i in range(columns + 1)]
+    right = [i + 1 for i in range(columns + 1)]
+    left[0], right[columns] = columns, 0
+    up = list(range(columns + 1))
+    down = list(range(columns + 1))
+    column = list(range(columns + 1))
+    row = [-1] * (columns + 1)
+    counts = [0] * (columns + 1)
+    first = []
+    for cell in range(n):
+        r, c = cell // size, cell % size
+        block = r // box * box + c // box
+        for num in range(size):
+            cols = [1 + cell, 1 + n + r * size + num, 1 + 2 * n + c * size + num, 1 + 3 * n + block * size + num]
+            first.append(len(column))
+            for k in range(4):
+                node = first[-1] + k
+                left.append(first[-1] + (k - 1) % 4)
+                right.append(first[-1] + (k + 1) % 4)
+                # Add the node at the bottom of its column
+                up.append(up[cols[k]])
+                down.append(cols[k])
+                down[up[cols[k]]] = node
+                up[cols[k]] = node
+                column.append(cols[k])
+                row.append(cell * size + num)
+                counts[cols[k]] += 1
+    return left, right, up, down, column, row, counts, first
+
+# Links of each board size already built by this process, they only need to be built once and every DancingLinks starts from a copy
+exact_cover_tables = dict()
+
+# Links of a size x size board (see exact_cover_links), built once for each size
+def load_exact_cover_links(size):
+    if size not in exact_cover_tables:
+        exact_cover_tables[size] = exact_cover_links(size)
+    return exact_cover_tables[size]
+
+# Exact cover solver for the puzzle with Knuth's Algorithm X and dancing links (see exact_cover_links)
+class DancingLinks:
+    def __init__(self, cells, stats = None):
+        self.failure = False
+
+        # SolverStats to fill in, if any
+        self.stats = stats
+
+        # Number in each cell by index, filled in once solved
+        self.size = len(cells)
+        self.nums = [0] * (self.size * self.size)
+
+        # The links change as columns are covered, the column of every node, its puzzle row and the first node of every puzzle row don't
+        left, right, up, down, self.column, self.row, counts, self.first = load_exact_cover_links(self.size)
+        self.left, self.right, self.up, self.down, self.counts = left[:], right[:], up[:], down[:], counts[:]
+
+        # Puzzle rows chosen so far
+        self.solution = []
+
+        # The given cells are chosen first, a column already covered means two givens clash
+        covered = [False] * len(self.counts)
+        for r in range(len(cells)):
+            for c in range(len(cells[r])):
+                if cells[r][c] != 0:
+                    if cells[r][c] > self.size:
+                        self.failure = True
+                        return
+                    node = self.first[(r * self.size + c) * self.size + cells[r][c] - 1]
+                    j = node
+                    while True:
+                        if covered[self.column[j]]:
+                            self.failure = True
+                            return
+                        covered[self.column[j]] = True
+                        self.cover(self.column[j])
+                        j = self.right[j]
+                        if j == node:
+                            break
+                    self.solution.append(self.row[node])
+
+    # Removes the column from the header list and every row with a node in it from the other columns
+    def cover(self, col):
+        left, right, up, down, column, counts = self.left, self.right, self.up, self.down, self.column, self.counts
+        right[left[col]] = right[col]
+        left[right[col]] = left[col]
+        i = down[col]
+        while i != col:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                counts[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    # Exactly undoes cover(col), in reverse order
+    def uncover(self, col):
+        left, right, up, down, column, counts = self.left, self.right, self.up, self.down, self.column, self.counts
+        i = up[col]
+        while i != col:
+            j = left[i]
+            while j != i:
+                counts[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[col]] = col
+        left[right[col]] = col
+
+    # Finds a solution, returns True and fills in nums if there is one
+    def search(self):
+        return self.count_solutions(1) == 1
+
+    # Counts the solutions, stopping as soon as limit of them are found (None to count them all)
+    # nums holds the first solution found
+    def count_solutions(self, limit = 2):
+        self.found = 0
+        self.limit = limit
+        if not self.failure:
+            self.start_depth = len(self.solution)
+            self.algorithm_x()
+            if self.stats is not None:
+                self.stats.finish()
+            if self.found == 0:
+                self.failure = True
+        return self.found
+
+    # Returns True once the search can stop, when limit solutions have been found
+    def algorithm_x(self):
+        if self.stats is not None:
+            self.stats.visit(len(self.solution) - self.start_depth)
+        right, down, column, counts = self.right, self.down, self.column, self.counts
+        # Every column is covered, so the chosen rows are a solution
+        if right[0] == 0:
+            self.found += 1
+            if self.found == 1:
+                for row in self.solution:
+                    self.nums[row // self.size] = row % self.size + 1
+            return self.found == self.limit
+
+        # Pick the column with the fewest rows left, like MRV
+        col = right[0]
+        best = col
+        while col != 0:
+            if counts[col] < counts[best]:
+                best = col
+            col = right[col]
+        if counts[best] == 0:
+            return False
+
+        self.cover(best)
+        i = down[best]
+        while i != best:
+            # Choose the row, covering the other columns it fills
+            self.solution.append(self.row[i])
+            j = right[i]
+            while j != i:
+                self.cover(column[j])
+                j = right[j]
+            done = self.algorithm_x()
+            j = self.left[i]
+            while j != i:
+                self.uncover(column[j])
+                j = self.left[j]
+            self.solution.pop()
+            if done:
+                self.uncover(best)
+                return True
+            if self.stats is not None:
+                self.stats.backtracks += 1
+            i = down[i]
+        self.uncover(best)
+        return False
+
+    # Numbers of the puzzle as a list of rows
+    def grid(self):
+        return [self.nums[r * self.size:(r + 1) * self.size] for r in range(self.size)]
+
+    # String representation of the puzzle
+    def __str__(self):
+        return grid_string(self.grid())
+
+# Solvers the command line can pick from
+ENGINES = ["backtrack", "dlx"]
+
+# Most orders of the rows (or columns) canonical_form tries for a puzzle
+CANONICAL_ORDERS = 8
+
+# Every order of the items, sorted by their keys, with each run of items that have the same key in any order
+# Returns just the sorted order if there would be more than limit of them
+def tied_orders(items, keys, limit):
+    items = sorted(items, key=lambda i: keys[i])
+    runs = [list(run) for key, run in itertools.groupby(items, key=lambda i: keys[i])]
+    if math.prod(math.factorial(len(run)) for run in runs) > limit:
+        return [items]
+    return [[i for order in orders for i in order] for orders in itertools.product(*[itertools.permutations(run) for run in runs])]
+
+# Orders of the rows of the grid for canonical_form to try: the bands (groups of box rows) and the rows in each band
+# are sorted by keys that none of the symmetries change, and rows or bands with the same key are tried in every order
+# Falls back on a single order if there would be more than CANONICAL_ORDERS of them
+def row_orders(grid, box):
+    size = len(grid)
+    # A row's key is its number of clues and the number of clues in each column it has a clue in, which stay the same
+    # whatever the numbers are called and however the other rows and the columns are reordered
+    col_counts = [sum(1 for r in range(size) if grid[r][c]) for c in range(size)]
+    row_keys = [(sum(1 for num in grid[r] if num), sorted(col_counts[c] for c in range(size) if grid[r][c])) for r in range(size)]
+    band_keys = [sorted(row_keys[b * box:(b + 1) * box]) for b in range(box)]
+    band_orders = tied_orders(range(box), band_keys, CANONICAL_ORDERS)
+    row_choices = [tied_orders(range(b * box, (b + 1) * box), row_keys, CANONICAL_ORDERS) for b in range(box)]
+    if len(band_orders) * math.prod(len(choices) for choices in row_choices) > CANONICAL_ORDERS:
+        band_orders = band_orders[:1]
+        row_choices = [choices[:1] for choices in row_choices]
+    return [[r for b in bands for r in rows[b]] for bands in band_orders for rows in itertools.product(*row_choices)]
+
+# Canonical form of the cells, the same for puzzles that only differ by the symmetries of sudoku: what the numbers are called,
+# the order of the bands and of the rows in each band, the order of the stacks and of the columns in each stack, and transposing
+# Puzzles too regular to try every order of their rows and columns (see row_orders) may not all get the same canonical form,
+# but it is always a puzzle with the same solutions as the cells once they are mapped back with undo_transform
+# Returns (canonical cells, transform)
+def canonical_form(cells):
+    size = len(cells)
+    box = box_size(size)
+    best = None
+    for transpose in [False, True]:
+        grid = [list(col) for col in zip(*cells)] if transpose else cells
+        cols_orders = row_orders([list(col) for col in zip(*grid)], box)
+        for rows in row_orders(grid, box):
+            for cols in cols_orders:
+                # Numbers are renamed 1, 2, 3, ... in the order they first show up
+                labels = {0: 0}
+                nums = []
+                for r in rows:
+                    row = grid[r]
+                    for c in cols:
+                        num = row[c]
+                        if num not in labels:
+                            labels[num] = len(labels)
+                        nums.append(labels[num])
+                if best is None or nums < best[0]:
+                    best = (nums, (transpose, rows, cols, labels))
+    nums, (transpose, rows, cols, labels) = best
+    # Numbers that are not in any clue get the labels left over
+    for num in range(1, size + 1):
+        if num not in labels:
+            labels[num] = len(labels)
+    return [nums[r * size:(r + 1) * size] for r in range(size)], (transpose, rows, cols, labels)
+
+# Maps a grid in the canonical form (such as its solution) back to the cells canonical_form was given
+def undo_transform(grid, transform):
+    transpose, rows, cols, labels = transform
+    nums = {label: num for num, label in labels.items()}
+    size = len(grid)
+    cells = [[0] * size for r in range(size)]
+    for i in range(size):
+        for j in range(size):
+            cells[rows[i]][cols[j]] = nums[grid[i][j]]
+    return [list(col) for col in zip(*cells)] if transpose else cells
+
+# Key of the cells in a SolutionCache (see cache.py)
+def puzzle_key(cells):
+    return "%d:%s" % (len(cells), ",".join(str(num) for row in cells for num in row))
+
+# Solves the cells with the engine, returns the solved Sudoku or DancingLinks, or None if there is no solution
+# With a SolutionCache, the solution of the canonical form of the cells is looked up first, so puzzles that were
+# already solved, or only differ from one by the symmetries of sudoku, are answered without searching
+def solve(cells, engine = "backtrack", rules = (), stats = None, cache = None):
+    if cache is not None:
+        # Clues outside 1 to the board size can't be solved, and canonical_form would rename them to ones that can
+        if any(num < 0 or num > len(cells) for row in cells for num in row):
+            return None
+        canonical, transform = canonical_form(cells)
+        key = puzzle_key(canonical)
+        hit, grid = cache.get(key)
+        if not hit:
+            sudoku = solve(canonical, engine, rules, stats)
+            grid = None if sudoku is None else sudoku.grid()
+            cache.put(key, grid)
+        if grid is None:
+            return None
+        # The solved grid has every cell given, so this only places them (and checks them)
+        sudoku = Sudoku(undo_transform(grid, transform))
+        return None if sudoku.failure else sudoku
+    if engine == "dlx":
+        sudoku = DancingLinks(cells, stats)
+        return sudoku if sudoku.search() else None
+    sudoku = Sudoku(cells, rules, stats)
     # If the puzzle can't be solved right from the start
     if sudoku.failure:
-        print("This puzzle does not have a solution.")
         return None
     # Otherwise try to find a solution
-    if sudoku.backtracking_search():
-        print("Solution:\n")
+    return sudoku if sudoku.backtracking_search() else None
+
+# Solves one subproblem of parallel_solve in a worker process, returns the solution as a list of rows or None
+def solve_subproblem(subproblem):
+    nums, size, engine, rules = subproblem
+    sudoku = solve([nums[r * size:(r + 1) * size] for r in range(size)], engine, rules)
+    return None if sudoku is None else sudoku.grid()
+
+# Solves the cells across a pool of worker processes, returns the solution as a list of rows or None
+# The top levels of the search tree are split into subproblems, a few for each worker, and the workers search them at the same time
+# As soon as one of them finds a solution the others are stopped, so the solution found may not be the one solve() finds
+# if the puzzle has more than one
+def parallel_solve(cells, workers = None, engine = "backtrack", rules = ()):
+    workers = workers or os.cpu_count()
+    root = Sudoku(cells, rules)
+    if root.failure:
+        return None
+    # Split deeper until there are enough subproblems for every worker to get several
+    subproblems = [root.nums[:]]
+    depth = 0
+    while 0 < len(subproblems) < workers * 8 and depth < root.unassigned:
+        depth += 1
+        subproblems = list(root.split(depth))
+    with multiprocessing.Pool(workers) as pool:
+        for grid in pool.imap_unordered(solve_subproblem, [(nums, root.size, engine, rules) for nums in subproblems]):
+            if grid is not None:
+                pool.terminate()
+                return grid
+    return None
+
+# Counts the solutions of the cells with the engine, stopping as soon as limit of them are found (None to count them all)
+# Returns the number found and the Sudoku or DancingLinks holding the first one
+# ex: count_solutions(cells, 2)[0] == 1 checks the puzzle has exactly one solution
+def count_solutions(cells, limit = 2, engine = "backtrack", rules = (), stats = None):
+    if engine == "dlx":
+        sudoku = DancingLinks(cells, stats)
+    else:
+        sudoku = Sudoku(cells, rules, stats)
+    return sudoku.count_solutions(limit), sudoku
+
+# count is the most solutions to count, or None to only find one
+# workers is the number of processes to solve it with (see parallel_solve), or None to solve it in this process
+# quiet skips printing, so it can be called from other code and only the returned solution is used
+# cache is a SolutionCache to look the solution up in first (see solve), it is not used to count solutions or with workers
+def main(user_input, stats = None, rules = (), engine = "backtrack", count = None, workers = None, quiet = False, cache = None):
+    def show(text):
+        if not quiet:
+            print(text)
+
+    if workers is not None and count is None:
+        grid = parallel_solve(parse(user_input), workers, engine, rules)
+        if grid is not None:
+            show("Solution:\n")
+            s = grid_string(grid)
+            show(s)
+            return s
+        show("This puzzle does not have a solution.")
+        return None
+    if count is None:
+        sudoku = solve(parse(user_input), engine, rules, stats, cache)
+    else:
+        found, sudoku = count_solutions(parse(user_input), count, engine, rules, stats)
+        if found == 0:
+            sudoku = None
+    if sudoku is not None:
+        show("Solution:\n")
         s = str(sudoku)
-        print(s)
+        show(s)
+        if count is not None:
+            show("This puzzle has %s%d solution%s." % ("at least " if found == count else "exactly ", found, "" if found == 1 else "s"))
         return s
-    print("This puzzle does not have a solution.")
+    show("This puzzle does not have a solution.")
     return None
 
-user_input = []
-if len(sys.argv) < 2:
-    user_input = (input("Please enter the name of input file:\n"))
-else:
-    user_input = (sys.argv[1])
-
-output = main(user_input)
-# If there is a solution, write the solution to a file
-if output is not None:
-    # Given name of the input file, create the correct filename of output file
-    filename = user_input.split(".")
-    if "input" in filename[0].lower():
-        name = filename[0].lower().split("input")
-        num = name[1]
-        filename[0] = name[0].upper() + "Output" + num
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solves the sudoku puzzle in the input file")
+    parser.add_argument("input", nargs="?", help="name of input file")
+    parser.add_argument("--engine", choices=ENGINES, default="backtrack",
+                        help="backtrack: backtracking search with forward checking (default), dlx: exact cover with dancing links")
+    parser.add_argument("--rules", nargs="+", choices=RULES + ["all"], default=[], metavar="RULE",
+                        help="propagation rules for the backtracking search to run after every assignment, any of " + ", ".join(RULES) + " or all (default none, only forward checking)")
+    parser.add_argument("--count", nargs="?", type=int, const=2, default=None, metavar="N",
+                        help="count the solutions, stopping at N (default 2, enough to check the solution is unique)")
+    parser.add_argument("--workers", type=int, default=None, help="split the search across this many processes (not with --count or --stats)")
+    parser.add_argument("--cache", metavar="FILE", help="sqlite file of solutions to look the puzzle up in first, and to save the solution in")
+    parser.add_argument("--stats", action="store_true", help="print search stats as JSON to stderr")
+    parser.add_argument("--progress", type=int, default=None, metavar="N", help="print search stats as JSON to stderr every N nodes")
+    args = parser.parse_args()
+
+    if args.input is None:
+        user_input = (input("Please enter the name of input file:\n"))
     else:
-        filename[0] += "_output"
-    open(".".join(filename), "w").write(output)
+        user_input = (args.input)
+
+    stats = None
+    if args.stats or args.progress:
+        progress = None
+        if args.progress:
+            progress = lambda stats: print(stats.to_json(), file=sys.stderr, flush=True)
+        stats = SolverStats(progress, args.progress or 10000)
+
+    rules = RULES if "all" in args.rules else args.rules
+    cache = None
+    if args.cache:
+        cache = SolutionCache(args.cache)
+    output = main(user_input, stats, rules, args.engine, args.count, args.workers, cache = cache)
+    if args.stats:
+        print(stats.to_json(), file=sys.stderr)
+        if cache is not None:
+            print(json.dumps(cache.stats()), file=sys.stderr)
+    # If there is a solution, write the solution to a file
+    if output is not None:
+        # Given name of the input file, create the correct filename of output file
+        filename = user_input.split(".")
+        if "input" in filename[0].lower():
+            name = filename[0].lower().split("input")
+            num = name[1]
+            filename[0] = name[0].upper() + "Output" + num
+        else:
+            filename[0] += "_output"
+        open(".".join(filename), "w").write(output)
@@ -0,0 +1,244 @@
+# Benchmarks the sudoku solver on seeded, generated puzzles and known hard puzzles and compares the results with a stored baseline
+# Exits with 1 if any solve got slower than the baseline by more than --max-slowdown
+# ex: python benchmark.py                      (run and compare with benchmark_baseline.json)
+#     python benchmark.py --update-baseline    (run and save the results as the new baseline)
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from app import RULES, DancingLinks, Sudoku, SolverStats, count_solutions, parallel_solve, parse
+
+FOLDER = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(FOLDER, "benchmark_baseline.json")
+
+# Puzzles to generate: (name, side of the blocks, number of given cells, how many)
+# Cells are removed at random from a solved grid, so the puzzles always have a solution but it may not be unique
+SUITE = [
+    ("clues-40", 3, 40, 2),
+    ("clues-32", 3, 32, 2),
+    ("clues-28", 3, 28, 2),
+    ("clues-24", 3, 24, 2),
+    ("16x16-clues-140", 4, 140, 2),
+]
+
+# Larger puzzles saved as input files: (name, filename)
+INPUTS = [
+    ("16x16-input2", "SUDUKO_Input2.txt"),
+    ("25x25-input3", "SUDUKO_Input3.txt"),
+]
+
+# Known hard puzzles with a unique solution, 17 is the fewest clues a sudoku can have
+HARD = [
+    ("17-clue-1", "000000010400000000020000000000050407008000300001090000300400200050100000000806000"),
+    ("17-clue-2", "000000012000035000000600070700000300000400800100000000000120000080000040050000600"),
+    ("17-clue-3", "000000012003600000000007000410020000000500300700000600280000040000300500000000000"),
+    ("inkala", "800000000003600000070090200050007000000045700000100030001000068008500010090000400"),
+]
+
+# Solvers to time on every puzzle: (name, function solving the cells with the stats and returning the solved Sudoku or None)
+def backtrack(cells, stats, rules = ()):
+    sudoku = Sudoku(cells, rules, stats)
+    if sudoku.failure or not sudoku.backtracking_search():
+        return None
+    return sudoku
+
+def dlx(cells, stats):
+    sudoku = DancingLinks(cells, stats)
+    if not sudoku.search():
+        return None
+    return sudoku
+
+SOLVERS = [
+    ("backtrack", backtrack),
+    ("singles", lambda cells, stats: backtrack(cells, stats, ["naked_singles", "hidden_singles"])),
+    ("propagate", lambda cells, stats: backtrack(cells, stats, RULES)),
+    ("dlx", dlx),
+    # Checking the solution is unique, which has to search the whole tree after the first solution
+    ("propagate-unique", lambda cells, stats: count_solutions(cells, 2, "backtrack", RULES, stats)[1]),
+    ("dlx-unique", lambda cells, stats: count_solutions(cells, 2, "dlx", (), stats)[1]),
+]
+
+class BenchmarkTimeout(Exception):
+    pass
+
+# Random solved grid with box x box blocks, made by shuffling the rows, columns and numbers of a simple solved grid
+def solved_grid(rng, box = 3):
+    size = box * box
+    bands = rng.sample(range(box), box)
+    stacks = rng.sample(range(box), box)
+    rows = [band * box + r for band in bands for r in rng.sample(range(box), box)]
+    cols = [stack * box + c for stack in stacks for c in rng.sample(range(box), box)]
+    nums = rng.sample(range(1, size + 1), size)
+    # (box * (r % box) + r // box + c) % size never repeats in a row, column or block
+    return [[nums[(box * (r % box) + r // box + c) % size] for c in cols] for r in rows]
+
+# Random puzzle with box x box blocks and the given number of clues, cells are removed from a random solved grid
+def random_puzzle(rng, box, clues):
+    cells = solved_grid(rng, box)
+    size = box * box
+    for k in rng.sample(range(size * size), size * size - clues):
+        cells[k // size][k % size] = 0
+    return cells
+
+# Generates the puzzles of the suite, always the same ones for the same seed, then adds the input files and the hard puzzles
+def generate(seed, hard):
+    rng = random.Random(seed)
+    puzzles = []
+    for name, box, clues, count in SUITE:
+        for i in range(count):
+            puzzles.append(("%s-%d" % (name, i + 1), random_puzzle(rng, box, clues)))
+    return puzzles + fixed_puzzles(hard)
+
+# The input files, then the hard puzzles if hard is set
+def fixed_puzzles(hard):
+    puzzles = []
+    for name, filename in INPUTS:
+        puzzles.append((name, parse(os.path.join(FOLDER, filename))))
+    if hard:
+        for name, line in HARD:
+            puzzles.append((name, [[int(line[r * 9 + c]) for c in range(9)] for r in range(9)]))
+    return puzzles
+
+# True if the solved grid fills in every cell correctly and keeps the given cells
+def valid_solution(cells, grid):
+    size = len(grid)
+    box = math.isqrt(size)
+    units = [row for row in grid] + [list(col) for col in zip(*grid)]
+    units += [[grid[r][c] for r in range(br, br + box) for c in range(bc, bc + box)] for br in range(0, size, box) for bc in range(0, size, box)]
+    return all(sorted(unit) == list(range(1, size + 1)) for unit in units) and \
+        all(cells[r][c] in (0, grid[r][c]) for r in range(size) for c in range(size))
+
+# Puzzle on one line, numbers are only separated by spaces when they can have two digits
+def puzzle_line(cells):
+    return ("" if len(cells) <= 9 else " ").join(str(num) for row in cells for num in row)
+
+# Solves the puzzle once with a SolverStats checking the time, giving up after timeout seconds
+# Returns the nodes (calls to backtrack) and the backtracks of the search
+def count(cells, solver, timeout):
+    start = time.perf_counter()
+
+    def check(stats):
+        if time.perf_counter() - start > timeout:
+            raise BenchmarkTimeout()
+
+    stats = SolverStats(check, 1000)
+    sudoku = solver([row[:] for row in cells], stats)
+    if sudoku is None or not valid_solution(cells, sudoku.grid()):
+        raise ValueError("wrong answer")
+    return stats.nodes, stats.backtracks
+
+# Solves the puzzle once without stats, the same way app.py does, and returns the seconds taken
+# There is no timeout, so it is only run once count has finished in time
+def run(cells, solver):
+    start = time.perf_counter()
+    sudoku = solver([row[:] for row in cells], None)
+    seconds = time.perf_counter() - start
+    if sudoku is None or not valid_solution(cells, sudoku.grid()):
+        raise ValueError("wrong answer")
+    return seconds
+
+# Runs every solver on every puzzle, yielding a result for each
+def benchmark(puzzles, solvers, repeat, timeout, memory):
+    for name, cells in puzzles:
+        for solver_name, solver in solvers:
+            result = {"case": name + "/" + solver_name, "puzzle": puzzle_line(cells)}
+            try:
+                result["nodes"], result["backtracks"] = count(cells, solver, timeout)
+                result["seconds"] = min(run(cells, solver) for i in range(repeat))
+                if memory:
+                    tracemalloc.start()
+                    run(cells, solver)
+                    result["peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+                    tracemalloc.stop()
+            except BenchmarkTimeout:
+                tracemalloc.stop()
+                result["timeout"] = True
+            yield result
+
+# Solves every puzzle with parallel_solve on 1 to max_workers processes, yielding (case, workers, seconds) for each
+# seconds is the fastest of repeat runs, and includes starting the pool and splitting the puzzle
+def scaling(puzzles, max_workers, repeat):
+    for name, cells in puzzles:
+        for workers in range(1, max_workers + 1):
+            times = []
+            for i in range(repeat):
+                start = time.perf_counter()
+                grid = parallel_solve([row[:] for row in cells], workers)
+                times.append(time.perf_counter() - start)
+                if grid is None or not valid_solution(cells, grid):
+                    raise ValueError("wrong answer")
+            yield name, workers, min(times)
+
+# Compares a result with its baseline, returning how many times slower it is (None if it can't be compared)
+# and whether it counts as a slowdown
+def compare(result, baseline, max_slowdown, min_seconds):
+    if baseline is None:
+        return None, False
+    if result.get("timeout"):
+        return None, not baseline.get("timeout")
+    if baseline.get("timeout"):
+        return None, False
+    ratio = result["seconds"] / baseline["seconds"] if baseline["seconds"] else None
+    # Very short solves are mostly noise
+    slower = ratio is not None and baseline["seconds"] >= min_seconds and ratio > 1 + max_slowdown
+    return ratio, slower
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the sudoku solver on generated and hard puzzles")
+    parser.add_argument("--seed", type=int, default=2022, help="seed of the puzzle generator (default 2022)")
+    parser.add_argument("--solver", action="append", help="only run these solvers (can be given more than once)")
+    parser.add_argument("--no-hard", action="store_true", help="skip the known hard puzzles")
+    parser.add_argument("--repeat", type=int, default=3, help="times to run each solve, the fastest is kept (default 3)")
+    parser.add_argument("--timeout", type=float, default=10, help="seconds before a solve is given up on (default 10)")
+    parser.add_argument("--no-memory", action="store_true", help="don't measure peak memory (it needs an extra run)")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline file (default benchmark_baseline.json)")
+    parser.add_argument("--max-slowdown", type=float, default=0.25, help="fraction slower than the baseline that fails the run (default 0.25)")
+    parser.add_argument("--min-seconds", type=float, default=0.01, help="solves faster than this in the baseline are not compared (default 0.01)")
+    parser.add_argument("--update-baseline", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--scaling", type=int, default=None, metavar="N", help="instead, time parallel_solve on the input files and hard puzzles with 1 to N processes")
+    args = parser.parse_args()
+
+    if args.scaling:
+        print("%-28s %8s %10s %8s" % ("case", "workers", "seconds", "speedup"))
+        for case, workers, seconds in scaling(fixed_puzzles(not args.no_hard), args.scaling, args.repeat):
+            if workers == 1:
+                single = seconds
+            print("%-28s %8d %10.4f %7.2fx" % (case, workers, seconds, single / seconds), flush=True)
+        sys.exit(0)
+
+    solvers = [solver for solver in SOLVERS if args.solver is None or solver[0] in args.solver]
+    baselines = dict()
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, "r") as f:
+            baselines = json.load(f)
+
+    results = dict()
+    slowdowns = 0
+    print("%-28s %10s %10s %10s %10s %10s" % ("case", "seconds", "nodes", "backtracks", "peak kb", "vs base"))
+    for result in benchmark(generate(args.seed, not args.no_hard), solvers, args.repeat, args.timeout, not args.no_memory):
+        case = result.pop("case")
+        results[case] = result
+        ratio, slower = compare(result, baselines.get(case), args.max_slowdown, args.min_seconds)
+        slowdowns += slower
+        if result.get("timeout"):
+            print("%-28s %10s" % (case, "timeout") + ("  SLOWER" if slower else ""), flush=True)
+        else:
+            print("%-28s %10.4f %10d %10d %10s %10s" % (case, result["seconds"], result["nodes"], result["backtracks"], result.get("peak_kb", "-"),
+                  "-" if ratio is None else "%.2fx" % ratio) + ("  SLOWER" if slower else ""), flush=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=1)
+        print("Saved baseline to " + args.baseline, file=sys.stderr)
+    if slowdowns:
+        print("%d solves were more than %g%% slower than the baseline" % (slowdowns, args.max_slowdown * 100), file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,114 @@
+# Solves a stream of sudoku puzzles in the one line format across a pool of processes
+# Each line is the 81 cells of a 9x9 puzzle row by row, with 0 or . for the blank cells
+# ex: 4..269780682....931.78..56.82.19.34.374...9150...74362851932600.04.95.....3.4.8.2.9
+# Solutions are written one per line in the same order as the puzzles, so line n of the output answers puzzle n of the input
+# With --count 2, each solution is followed by 1 if it is unique or 2 if there are more
+# A puzzle that is not valid or has no solution gets an error on its line instead, the run carries on
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import argparse
+import itertools
+import os
+import sys
+import time
+
+from app import ENGINES, RULES, count_solutions, solve
+
+# Given a line in the one line format, returns cells of the puzzle
+def parse_line(line):
+    line = line.strip()
+    if len(line) != 81 or any(ch not in "0123456789." for ch in line):
+        raise ValueError("expected 81 characters of 1-9, with 0 or . for blank cells")
+    nums = [0 if ch == "." else int(ch) for ch in line]
+    return [nums[r * 9:(r + 1) * 9] for r in range(9)]
+
+# Yields (line number, line) for each puzzle in the file, or stdin if filename is -, one at a time
+# Blank lines and lines starting with # are skipped, but still counted in the line numbers
+def read_lines(filename):
+    f = sys.stdin if filename == "-" else open(filename, "r")
+    try:
+        for number, line in enumerate(f, 1):
+            if line.strip() and not line.startswith("#"):
+                yield number, line
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+# Solves the puzzles of a chunk in a worker process
+# If count is given, the solutions of each puzzle are also counted up to count and the number is added after the solution
+# Returns (line number, output line, whether it was solved) for each puzzle, in order
+def solve_chunk(chunk, engine, rules, count = None):
+    results = []
+    for number, line in chunk:
+        try:
+            if count is None:
+                sudoku = solve(parse_line(line), engine, rules)
+            else:
+                found, sudoku = count_solutions(parse_line(line), count, engine, rules)
+                if found == 0:
+                    sudoku = None
+        except ValueError as e:
+            results.append((number, "line %d: %s" % (number, e), False))
+            continue
+        if sudoku is None:
+            results.append((number, "line %d: no solution" % number, False))
+        else:
+            solution = "".join(str(num) for row in sudoku.grid() for num in row)
+            results.append((number, solution if count is None else "%s %d" % (solution, found), True))
+    return results
+
+# Splits the lines into lists of chunk_size lines, reading only one chunk at a time
+def chunks(lines, chunk_size):
+    lines = iter(lines)
+    while True:
+        chunk = list(itertools.islice(lines, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+# Solves every puzzle across the pool and yields the results in input order
+# Only a few chunks per worker are handed out at a time, and results are yielded as soon as the oldest chunk is done,
+# so memory stays the same no matter how many puzzles there are
+def solve_all(lines, engine = "dlx", rules = (), workers = None, chunk_size = 256, count = None, pending_per_worker = 4):
+    workers = workers or os.cpu_count()
+    # One worker solves in this process, skipping the cost of sending puzzles to another one
+    if workers == 1:
+        for chunk in chunks(lines, chunk_size):
+            yield from solve_chunk(chunk, engine, rules, count)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for chunk in chunks(lines, chunk_size):
+            pending.append(pool.submit(solve_chunk, chunk, engine, rules, count))
+            if len(pending) >= workers * pending_per_worker:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solves a file of one line sudoku puzzles across a pool of processes")
+    parser.add_argument("input", help="file of puzzles, one per line, or - to read them from stdin")
+    parser.add_argument("-o", "--output", default="-", help="file to write the solutions to (default - for stdout)")
+    parser.add_argument("--engine", choices=ENGINES, default="dlx", help="solver, same as app.py (default dlx)")
+    parser.add_argument("--rules", nargs="+", choices=RULES + ["all"], default=[], metavar="RULE", help="propagation rules for the backtrack engine, same as app.py")
+    parser.add_argument("--count", nargs="?", type=int, const=2, default=None, metavar="N",
+                        help="also count the solutions of each puzzle up to N and write the number after the solution (default 2, to check they are unique)")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--chunk-size", type=int, default=256, help="puzzles sent to a worker at a time (default 256)")
+    args = parser.parse_args()
+
+    rules = RULES if "all" in args.rules else args.rules
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    solved = failed = 0
+    start = time.perf_counter()
+    for number, line, ok in solve_all(read_lines(args.input), args.engine, rules, args.workers, args.chunk_size, args.count):
+        output.write(line + "\n")
+        if ok:
+            solved += 1
+        else:
+            failed += 1
+            print(line, file=sys.stderr)
+    if output is not sys.stdout:
+        output.close()
+    elapsed = time.perf_counter() - start
+    print("Solved %d puzzles (%d not solved) in %.2f seconds, %.1f puzzles/s" % (solved, failed, elapsed, (solved + failed) / elapsed if elapsed else 0), file=sys.stderr)
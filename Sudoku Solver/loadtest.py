@@ -0,0 +1,101 @@
+# Sends puzzles to a running service.py from many clients at once and reports the latency of the requests
+# Each client keeps its own connection open and sends its next request as soon as the last one is answered
+# ex: python service.py &
+#     python loadtest.py --clients 16 --requests 2000
+import argparse
+import http.client
+import itertools
+import json
+import math
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from benchmark import random_puzzle
+from bulk import read_lines
+
+# Request bodies for count seeded random 9x9 puzzles with the given number of clues
+# With distinct, only that many different puzzles are made and they are sent over and over
+def generated_bodies(seed, count, clues, engine, distinct = None):
+    rng = random.Random(seed)
+    bodies = [json.dumps({"cells": random_puzzle(rng, 3, clues), "engine": engine}) for i in range(min(count, distinct or count))]
+    return list(itertools.islice(itertools.cycle(bodies), count))
+
+# Request bodies for the puzzles of a file in the one line format (see bulk.py), repeated until there are count of them
+def file_bodies(filename, count, engine):
+    lines = [line.strip() for number, line in read_lines(filename)]
+    return [json.dumps({"line": line, "engine": engine}) for line in itertools.islice(itertools.cycle(lines), count)]
+
+# Nearest rank percentile of the sorted latencies
+def percentile(latencies, p):
+    return latencies[max(0, math.ceil(p / 100 * len(latencies)) - 1)]
+
+# Sends every body to the service from clients threads at once
+# Returns the seconds each request took (sorted), the number of requests that failed, and the seconds the whole run took
+def run(url, bodies, clients):
+    parts = urlsplit(url)
+    bodies = iter(bodies)
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def client():
+        nonlocal errors
+        connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+        while True:
+            with lock:
+                body = next(bodies, None)
+            if body is None:
+                break
+            start = time.perf_counter()
+            try:
+                connection.request("POST", "/solve", body, {"Content-Type": "application/json"})
+                response = connection.getresponse()
+                response.read()
+                failed = response.status != 200
+            except (OSError, http.client.HTTPException):
+                # Start over with a new connection
+                connection.close()
+                failed = True
+            seconds = time.perf_counter() - start
+            with lock:
+                latencies.append(seconds)
+                errors += failed
+        connection.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), errors, time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load tests a running sudoku service and reports the latency percentiles")
+    parser.add_argument("--url", default="http://127.0.0.1:8081", help="address of the service (default http://127.0.0.1:8081)")
+    parser.add_argument("--clients", type=int, default=8, help="clients sending requests at the same time (default 8)")
+    parser.add_argument("--requests", type=int, default=1000, help="total requests to send (default 1000)")
+    parser.add_argument("--puzzles", help="file of puzzles in the one line format to send, instead of generated ones")
+    parser.add_argument("--clues", type=int, default=28, help="given cells of the generated puzzles (default 28)")
+    parser.add_argument("--engine", default="backtrack", help="engine the service solves with (default backtrack)")
+    parser.add_argument("--distinct", type=int, default=None, help="only generate this many different puzzles and repeat them, to test the cache")
+    parser.add_argument("--seed", type=int, default=2022, help="seed of the puzzle generator (default 2022)")
+    args = parser.parse_args()
+
+    if args.puzzles:
+        bodies = file_bodies(args.puzzles, args.requests, args.engine)
+    else:
+        bodies = generated_bodies(args.seed, args.requests, args.clues, args.engine, args.distinct)
+    latencies, errors, seconds = run(args.url, bodies, args.clients)
+    if not latencies:
+        print("No requests were sent", file=sys.stderr)
+        sys.exit(1)
+    print("requests   %d (%d failed) from %d clients in %.2f seconds, %.1f requests/s" % (len(latencies), errors, args.clients, seconds, len(latencies) / seconds))
+    for p in [50, 90, 99]:
+        print("p%-9d %.2f ms" % (p, percentile(latencies, p) * 1000))
+    print("max        %.2f ms" % (latencies[-1] * 1000))
+    if errors:
+        sys.exit(1)
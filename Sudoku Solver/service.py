@@ -0,0 +1,182 @@
+# Keeps the sudoku solver running as a local HTTP service, so puzzles are solved without starting Python every time
+# and the peer tables and exact cover links stay built between requests
+# POST /solve with a JSON body {"cells": [[5, 3, 0, ...], ...]} or {"line": "53..7...."} (see bulk.py), and optionally
+# "engine", "rules" and "count" (same as app.py). Answers {"solution": [[5, 3, 4, ...], ...] or null, "seconds": ...}
+# with "count" added if it was asked for, or {"error": ...} with status 400 if the request is not valid
+# Solutions are cached by the canonical form of the puzzle (see canonical_form in app.py), "cached" tells if it was a hit
+# GET /health answers {"status": "ok"}, GET /stats answers the hit rate and size of the cache
+# ex: python service.py --port 8081
+#     curl -d '{"line": "53..7....6..195....98....6.8...6...34..8.3..17...2...6.6....28....419..5....8..79"}' http://127.0.0.1:8081/solve
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import os
+import sys
+import time
+
+from app import ENGINES, RULES, box_size, canonical_form, count_solutions, load_board_tables, load_exact_cover_links, puzzle_key, solve, undo_transform
+from bulk import parse_line
+from cache import SolutionCache
+
+# Board sizes whose tables are built before the first request comes in
+WARM_SIZES = [9, 16, 25]
+
+# Builds the tables of the common board sizes in this process
+def warm():
+    for size in WARM_SIZES:
+        load_board_tables(size)
+        load_exact_cover_links(size)
+
+# Checks the cells of a request are a square board of numbers from 0 to its size, returns them
+def check_cells(cells):
+    if not isinstance(cells, list) or not cells or not all(isinstance(row, list) for row in cells):
+        raise ValueError("cells must be a list of rows")
+    size = len(cells)
+    box_size(size)
+    for row in cells:
+        if len(row) != size or not all(isinstance(num, int) and 0 <= num <= size for num in row):
+            raise ValueError("every row must have %d numbers from 0 to %d" % (size, size))
+    return cells
+
+# Checks a request and returns its cells, engine, rules and count
+# Raises ValueError if the request is not valid
+def check_request(request):
+    if "line" in request:
+        if not isinstance(request["line"], str):
+            raise ValueError("line must be a string")
+        cells = parse_line(request["line"])
+    else:
+        cells = check_cells(request.get("cells"))
+    engine = request.get("engine", "backtrack")
+    if engine not in ENGINES:
+        raise ValueError("engine must be one of " + ", ".join(ENGINES))
+    rules = request.get("rules", [])
+    if not isinstance(rules, list) or any(rule not in RULES + ["all"] for rule in rules):
+        raise ValueError("rules must be a list of " + ", ".join(RULES) + " or all")
+    if "all" in rules:
+        rules = RULES
+    count = request.get("count")
+    if count is not None and (not isinstance(count, int) or count < 1):
+        raise ValueError("count must be a positive number")
+    return cells, engine, rules, count
+
+# Solves the cells of a request and returns the response
+def solve_request(cells, engine, rules, count):
+    start = time.perf_counter()
+    response = dict()
+    if count is None:
+        sudoku = solve(cells, engine, rules)
+    else:
+        found, sudoku = count_solutions(cells, count, engine, rules)
+        response["count"] = found
+        if found == 0:
+            sudoku = None
+    response["solution"] = None if sudoku is None else sudoku.grid()
+    response["seconds"] = round(time.perf_counter() - start, 6)
+    return response
+
+class SolveHandler(BaseHTTPRequestHandler):
+    # Keeps connections open, so a client can send many requests without connecting again
+    protocol_version = "HTTP/1.1"
+    # The headers and the body are written separately, which would otherwise wait on the client's delayed ACK
+    disable_nagle_algorithm = True
+    # Process pool the puzzles are solved in, or None to solve them in the thread of the request (set by serve)
+    pool = None
+    # SolutionCache shared by every request, or None (set by serve)
+    cache = None
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.reply(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self.reply(200, {"cache": None if self.cache is None else self.cache.stats()})
+        else:
+            self.reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path != "/solve":
+            self.reply(404, {"error": "not found"})
+            return
+        try:
+            request = json.loads(body)
+            if not isinstance(request, dict):
+                raise ValueError("expected a JSON object")
+            response = self.answer(*check_request(request))
+        except ValueError as e:
+            self.reply(400, {"error": str(e)})
+            return
+        except Exception as e:
+            self.reply(500, {"error": "%s: %s" % (type(e).__name__, e)})
+            return
+        self.reply(200, response)
+
+    # Runs solve_request in the pool, or in this thread if there is none
+    def run(self, cells, engine, rules, count):
+        if self.pool is None:
+            return solve_request(cells, engine, rules, count)
+        return self.pool.submit(solve_request, cells, engine, rules, count).result()
+
+    # The cache is looked up in this thread, so hits never wait for the pool
+    # Counting solutions is not cached
+    def answer(self, cells, engine, rules, count):
+        if self.cache is None or count is not None:
+            return self.run(cells, engine, rules, count)
+        start = time.perf_counter()
+        canonical, transform = canonical_form(cells)
+        key = puzzle_key(canonical)
+        hit, grid = self.cache.get(key)
+        if not hit:
+            grid = self.run(canonical, engine, rules, None)["solution"]
+            self.cache.put(key, grid)
+        solution = None if grid is None else undo_transform(grid, transform)
+        return {"solution": solution, "cached": hit, "seconds": round(time.perf_counter() - start, 6)}
+
+    # Requests are not logged one by one
+    def log_message(self, format, *args):
+        pass
+
+# Serves requests until interrupted, each connection gets its own thread
+# With workers, the puzzles are solved in that many processes (each with its own warm tables) so they run in parallel,
+# otherwise they are solved in the threads of the requests, which is faster for easy puzzles but only uses one CPU
+# cache is the SolutionCache to answer repeated puzzles from, or None to solve every one
+def serve(host, port, workers = None, cache = None):
+    warm()
+    SolveHandler.cache = cache
+    if workers:
+        SolveHandler.pool = ProcessPoolExecutor(workers, initializer=warm)
+    server = ThreadingHTTPServer((host, port), SolveHandler)
+    print("Serving on http://%s:%d" % server.server_address[:2], file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if SolveHandler.pool is not None:
+            SolveHandler.pool.shutdown(cancel_futures=True)
+        if cache is not None:
+            cache.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves the sudoku solver over local HTTP")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default 127.0.0.1, only this machine)")
+    parser.add_argument("--port", type=int, default=8081, help="port to listen on (default 8081)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes to solve in, 0 to solve in the request threads (default: number of CPUs)")
+    parser.add_argument("--cache", metavar="FILE", help="sqlite file to also keep the cached solutions in, so they last between runs")
+    parser.add_argument("--cache-size", type=int, default=10000, help="solutions kept in memory, 0 to turn the cache off (default 10000)")
+    parser.add_argument("--cache-disk-size", type=int, default=1000000, help="solutions kept in the --cache file (default 1000000)")
+    args = parser.parse_args()
+    cache = None
+    if args.cache_size > 0:
+        cache = SolutionCache(args.cache, args.cache_size, args.cache_disk_size)
+    serve(args.host, args.port, args.workers, cache)